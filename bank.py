@@ -0,0 +1,274 @@
+# compact binary storage for puzzles
+#
+# a bank file starts with an 8 byte header (magic, version, grid size) followed by
+# fixed-width records, one per board. a record is the region id of every tile packed
+# two to a byte (row-major, high nibble first), the column of the queen in each row,
+# the board's origin (the seed, batch index and big region scale that
+# puzzle.generate_puzzle rebuilds it from) and its difficulty tier (its index in
+# difficulty.TIERS), so an 8x8 board takes 52 bytes instead of a few KB of JSON.
+# records are read through a memory map, so looking one up never parses the rest of
+# the file
+
+from puzzle import Puzzle
+from difficulty import TIERS, grade_puzzle
+from steering import BIG_REGION_SCALES
+from constants import GRID_SIZE
+
+import mmap
+import os
+import struct
+
+MAGIC = b"QNBK"
+VERSION = 3
+HEADER = struct.Struct("<4sBBxx")
+USED = struct.Struct("<I")
+# seed, batch index and index of the scale in steering.BIG_REGION_SCALES
+ORIGIN = struct.Struct("<QHB")
+# the scale stored for boards that don't come from a seed
+NO_SCALE = 0xFF
+
+
+def get_bank_path(bank_dir, size):
+    return os.path.join(bank_dir, f"bank_{size}.bin")
+
+
+def _board_size(size):
+    # bytes taken by the regions and the solution
+    return (size * size + 1) // 2 + size
+
+
+def record_size(size):
+    return _board_size(size) + ORIGIN.size + 1
+
+
+def encode_puzzle(puzzle, tier, origin=None):
+    """Packs a puzzle's regions, solution, origin and difficulty tier into a record.
+    `origin` is the (seed, index, scale) puzzle.generate_puzzle takes to rebuild the
+    puzzle, or None if it wasn't generated from a seed"""
+    regions = puzzle.regions
+    if len(regions) % 2:
+        regions += b"\x00"
+
+    record = bytearray(
+        (regions[k] << 4) | regions[k + 1] for k in range(0, len(regions), 2)
+    )
+    record.extend(puzzle.solution)
+    if origin is None:
+        record.extend(ORIGIN.pack(0, 0, NO_SCALE))
+    else:
+        seed, index, scale = origin
+        record.extend(ORIGIN.pack(seed, index, BIG_REGION_SCALES.index(scale)))
+    record.append(TIERS.index(tier))
+
+    return bytes(record)
+
+
+def decode_puzzle(record, size=GRID_SIZE):
+    """Rebuilds a Puzzle from a record"""
+    region_bytes = (size * size + 1) // 2
+
+    regions = bytearray(size * size)
+    for cell in range(size * size):
+        packed = record[cell // 2]
+        regions[cell] = packed & 0xF if cell % 2 else packed >> 4
+
+    return Puzzle(size, regions, record[region_bytes : region_bytes + size])
+
+
+def record_tier(record):
+    return TIERS[record[-1]]
+
+
+def record_origin(record):
+    """The (seed, index, scale) a record's board was generated from, or None"""
+    seed, index, scale = ORIGIN.unpack(record[-1 - ORIGIN.size : -1])
+    if scale == NO_SCALE:
+        return None
+
+    return seed, index, BIG_REGION_SCALES[scale]
+
+
+def _upgrade(path, size, old_version):
+    """Rewrites a version 1 bank, whose records are only the board, or a version 2
+    bank, whose records add the tier, as the current version. Boards from version 1
+    are graded on the way, and no board keeps an origin"""
+    old_record_size = _board_size(size) + (old_version - 1)
+    with open(path, "rb") as f:
+        version = HEADER.unpack(f.read(HEADER.size))[1]
+        data = f.read()
+
+    # another process got here first
+    if version != old_version:
+        return
+
+    # a temp file of our own, so two processes upgrading at once don't write over
+    # each other's
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size))
+        for start in range(0, len(data) - old_record_size + 1, old_record_size):
+            record = data[start : start + old_record_size]
+            puzzle = decode_puzzle(record, size)
+            if old_version == 1:
+                tier = grade_puzzle(puzzle).tier
+            else:
+                tier = record_tier(record)
+            f.write(encode_puzzle(puzzle, tier))
+
+    with open(path, "rb") as f:
+        version = HEADER.unpack(f.read(HEADER.size))[1]
+
+    # don't replace a bank another process upgraded (and may have appended to) while
+    # we were at it
+    if version == old_version:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+
+
+class PuzzleBank:
+    """An append-only file of fixed-width board records for one grid size. Several
+    processes can append to the same bank at once. Boards that have been played are
+    recorded as tombstones in a second append-only file (`path` + ".used") instead of
+    being removed, so nothing is ever rewritten"""
+
+    def __init__(self, path, size=GRID_SIZE):
+        self.path = path
+        self.size = size
+        self.record_size = record_size(size)
+
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, size))
+
+        self._file = open(path, "rb")
+        magic, version, file_size = HEADER.unpack(self._file.read(HEADER.size))
+        if magic == MAGIC and version in (1, 2) and file_size == size:
+            self._file.close()
+            _upgrade(path, size, version)
+
+            # check the header of whichever upgrade won
+            self._file = open(path, "rb")
+            magic, version, file_size = HEADER.unpack(self._file.read(HEADER.size))
+
+        if magic != MAGIC or version != VERSION or file_size != size:
+            self._file.close()
+            raise ValueError(
+                f"{path} is not a version {VERSION} bank of {size}x{size} boards"
+            )
+
+        # records are written with a single O_APPEND write, so appends from different
+        # processes never interleave and only a crash can leave a partial record
+        self._append_fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        partial = (os.fstat(self._append_fd).st_size - HEADER.size) % self.record_size
+        if partial:
+            os.truncate(path, os.fstat(self._append_fd).st_size - partial)
+
+        self._mmap = None
+
+        self._used_path = path + ".used"
+        self.used = set()
+        if os.path.exists(self._used_path):
+            with open(self._used_path, "rb") as f:
+                data = f.read()
+
+            # ignore a partially written tombstone
+            data = data[: len(data) - len(data) % USED.size]
+            self.used = {index for (index,) in USED.iter_unpack(data)}
+
+        self._used_file = None
+
+    def __len__(self):
+        file_size = os.fstat(self._file.fileno()).st_size
+        return (file_size - HEADER.size) // self.record_size
+
+    def _offset(self, index):
+        return HEADER.size + index * self.record_size
+
+    def get_record(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError(f"Bank index {index} out of range")
+
+        end = self._offset(index + 1)
+        self._map(end)
+        return self._mmap[self._offset(index) : end]
+
+    def _map(self, end):
+        if self._mmap is None or len(self._mmap) < end:
+            # the file grew since we mapped it
+            self._unmap()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, index):
+        return decode_puzzle(self.get_record(index), self.size)
+
+    def get_tier(self, index):
+        return record_tier(self.get_record(index))
+
+    def get_origin(self, index):
+        return record_origin(self.get_record(index))
+
+    def append(self, puzzle, tier=None, origin=None):
+        """Adds a puzzle to the end of the bank and returns its index. The puzzle is
+        graded if its difficulty `tier` isn't given. `origin` is as in encode_puzzle"""
+        if tier is None:
+            tier = grade_puzzle(puzzle).tier
+
+        os.write(self._append_fd, encode_puzzle(puzzle, tier, origin))
+
+        # with O_APPEND our file position is the end of the record we just wrote, even
+        # if other processes have appended since
+        end = os.lseek(self._append_fd, 0, os.SEEK_CUR)
+        return (end - HEADER.size) // self.record_size - 1
+
+    def mark_used(self, index):
+        if self._used_file is None:
+            self._used_file = open(self._used_path, "ab")
+
+        self._used_file.write(USED.pack(index))
+        self._used_file.flush()
+        self.used.add(index)
+
+    def unused_indices(self, stop=None, start=0):
+        """Yields the index of every board from `start` up to `stop` that hasn't been
+        used"""
+        if stop is None:
+            stop = len(self)
+
+        for index in range(start, stop):
+            if index not in self.used:
+                yield index
+
+    def tier_indices(self, tier, stop=None, start=0):
+        """Yields the index of every board of difficulty `tier` from `start` up to
+        `stop` that hasn't been used. Only the tier byte of each record is read, in
+        one slice of the memory map, so scanning a big bank is cheap"""
+        if stop is None:
+            stop = len(self)
+        if start >= stop:
+            return
+
+        self._map(self._offset(stop))
+        tiers = self._mmap[
+            self._offset(start + 1) - 1 : self._offset(stop) : self.record_size
+        ]
+        tier_byte = bytes([TIERS.index(tier)])
+
+        k = tiers.find(tier_byte)
+        while k != -1:
+            if start + k not in self.used:
+                yield start + k
+            k = tiers.find(tier_byte, k + 1)
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def close(self):
+        self._unmap()
+        self._file.close()
+        os.close(self._append_fd)
+
+        if self._used_file is not None:
+            self._used_file.close()
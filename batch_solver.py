@@ -0,0 +1,63 @@
+# vectorized solution counting for many colorings at once
+#
+# a coloring's solutions are exactly the valid queen layouts whose queens all land in
+# different regions. with every layout in a layouts.LayoutIndex, counting them is one
+# numpy pass: look up the region of each layout's queen in every row, OR the region
+# bits together and count the layouts that cover all `size` regions
+
+from constants import GRID_SIZE
+from layouts import get_layout_index
+
+import numpy as np
+
+# how many (board, layout) pairs to test per numpy call, to bound memory use
+CHUNK_CELLS = 1 << 21
+
+# for each grid size, a (size, num_layouts) array holding the flat cell index of the
+# queen in each row of each layout
+_layout_cells = {}
+
+
+def _get_layout_cells(size):
+    if size not in _layout_cells:
+        layouts = np.frombuffer(get_layout_index(size).buffer, dtype=np.uint8)
+        cols = layouts.reshape(-1, size).astype(np.intp)
+        rows = np.arange(size, dtype=np.intp) * size
+        _layout_cells[size] = np.ascontiguousarray((cols + rows).T)
+
+    return _layout_cells[size]
+
+
+def count_solutions_batch(regions, size=GRID_SIZE):
+    """Counts the solutions of one or more colorings. `regions` is a sequence of
+    size * size region ids (as from Board.to_regions, or as bytes), or a 2d array or
+    list of bytes with one such row per coloring. Returns an int for a single coloring
+    and an array of ints for a batch"""
+    if isinstance(regions, bytes):
+        regions = np.frombuffer(regions, dtype=np.uint8)
+    elif isinstance(regions, list) and regions and isinstance(regions[0], bytes):
+        regions = np.frombuffer(b"".join(regions), dtype=np.uint8)
+        regions = regions.reshape(-1, size * size)
+
+    regions = np.asarray(regions, dtype=np.uint16)
+    single = regions.ndim == 1
+    regions = regions.reshape(-1, size * size)
+    if len(regions) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    bits = np.left_shift(np.uint16(1), regions)
+    full = (1 << size) - 1
+    cells = _get_layout_cells(size)
+
+    counts = np.zeros(len(regions), dtype=np.int64)
+    chunk = max(1, CHUNK_CELLS // len(regions))
+    for start in range(0, cells.shape[1], chunk):
+        block = cells[:, start : start + chunk]
+
+        covered = bits[:, block[0]]
+        for row in range(1, size):
+            covered |= bits[:, block[row]]
+
+        counts += np.count_nonzero(covered == full, axis=1)
+
+    return int(counts[0]) if single else counts
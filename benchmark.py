@@ -0,0 +1,297 @@
+# benchmarks for board generation, solving and rendering, e.g.
+#   python3 benchmark.py --sizes 8 9 10 --seconds 30 -o benchmark.json
+# results are written as JSON so runs of different versions can be compared
+
+from constants import GRID_SIZES, SCREEN_WIDTH, SCREEN_HEIGHT
+from generate_queens import generate_random_board_posns
+from layouts import LAYOUT_INDEX_MAX_SIZE
+from batch_solver import count_solutions_batch
+from puzzle import generate_random_puzzles
+from coloring import color_layout
+from solver import count_solutions
+from difficulty import TIERS, grade_puzzle
+import metrics
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+
+def _percentile(values, q):
+    """Nearest-rank percentile, or None if there are no values"""
+    if not values:
+        return None
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else None
+
+
+def benchmark_generation(size, seconds, seed=0):
+    """Generates boards for about `seconds` seconds, one round (one queen layout) at a
+    time"""
+    rng = random.Random(f"{seed}:{size}")
+    board_times = []
+
+    metrics.reset()
+    metrics.enable()
+
+    t0 = last = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        puzzles = generate_random_puzzles(size, rng=rng, max_rounds=1)
+
+        if puzzles:
+            # boards found in the same round share the time it took to find them
+            now = time.perf_counter()
+            board_times.extend((now - last) / len(puzzles) for _ in puzzles)
+            last = now
+
+    elapsed = time.perf_counter() - t0
+    metrics.enable(False)
+
+    counters = metrics.counters
+    boards = counters.get("generate.puzzles", 0)
+    colorings = counters.get("coloring.attempts", 0)
+    solver_calls = counters.get("generate.solver_calls", 0) + counters.get(
+        "repair.solver_calls", 0
+    )
+
+    return {
+        "seconds": elapsed,
+        "boards": boards,
+        "boards_per_second": _rate(boards, elapsed),
+        "median_seconds_per_board": (
+            statistics.median(board_times) if board_times else None
+        ),
+        "p99_seconds_per_board": _percentile(board_times, 99),
+        "colorings_per_second": _rate(colorings, elapsed),
+        "solver_calls_per_board": solver_calls / boards if boards else None,
+        "repaired_boards": counters.get("repair.succeeded", 0),
+        "metrics": metrics.snapshot(),
+    }
+
+
+def _candidate_colorings(size, count, seconds, seed=0):
+    """Up to `count` colorings of random layouts, the same for the same seed"""
+    rng = random.Random(f"{seed}:{size}:colorings")
+    colorings = []
+
+    t0 = time.perf_counter()
+    while len(colorings) < count and time.perf_counter() - t0 < seconds:
+        solution = [j for _, j in generate_random_board_posns(size, rng)]
+        regions = color_layout(solution, size, rng)
+        if regions is not None:
+            colorings.append(bytes(regions))
+
+    return colorings
+
+
+def benchmark_solver(size, count, seed=0):
+    """Checks the same candidate colorings with the search solver and, where the
+    size has a layout index, the batch checker"""
+    colorings = _candidate_colorings(size, count, 30, seed)
+    results = {"colorings": len(colorings)}
+    if not colorings:
+        return results
+
+    stats = {}
+    t0 = time.perf_counter()
+    for regions in colorings:
+        count_solutions(regions, size, stats=stats)
+    elapsed = time.perf_counter() - t0
+
+    results["search"] = {
+        "seconds": elapsed,
+        "calls_per_second": _rate(len(colorings), elapsed),
+        "nodes": stats["nodes"],
+        "nodes_per_call": stats["nodes"] / len(colorings),
+        "nodes_per_second": _rate(stats["nodes"], elapsed),
+    }
+
+    if size <= LAYOUT_INDEX_MAX_SIZE:
+        # load the layout index first so it isn't timed
+        count_solutions_batch(colorings[:1], size)
+
+        t0 = time.perf_counter()
+        count_solutions_batch(colorings, size)
+        elapsed = time.perf_counter() - t0
+
+        results["batch"] = {
+            "seconds": elapsed,
+            "calls_per_second": _rate(len(colorings), elapsed),
+        }
+
+    return results
+
+
+def benchmark_grading(size, count, seed=0):
+    """Grades up to `count` generated boards, as the workers do for every board"""
+    rng = random.Random(f"{seed}:{size}:grading")
+    puzzles = []
+
+    t0 = time.perf_counter()
+    while len(puzzles) < count and time.perf_counter() - t0 < 30:
+        puzzles.extend(generate_random_puzzles(size, rng=rng))
+    puzzles = puzzles[:count]
+
+    t0 = time.perf_counter()
+    grades = [grade_puzzle(puzzle) for puzzle in puzzles]
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "boards": len(puzzles),
+        "seconds": elapsed,
+        "boards_per_second": _rate(len(puzzles), elapsed),
+        "tiers": {tier: sum(g.tier == tier for g in grades) for tier in TIERS},
+        "unsolved": sum(not g.solved for g in grades),
+    }
+
+
+def benchmark_render(sizes, frames):
+    """Times Renderer.draw on a hidden window for a full redraw, a frame where one
+    tile changed and a frame where nothing changed"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    import pygame
+    import pygame.freetype
+
+    from board import Board
+    from button import Button
+    from renderer import Renderer
+    from sprites import QueenSprites
+    from tile import TileState
+
+    pygame.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode([SCREEN_WIDTH, SCREEN_HEIGHT])
+    small_font = pygame.freetype.SysFont("Comic Sans MS", 20)
+    large_font = pygame.freetype.SysFont("Comic Sans MS", 60)
+    renderer = Renderer(screen, small_font, large_font, QueenSprites(grid_sizes=sizes))
+    buttons = [Button("New Game", (200, 50), small_font)]
+
+    results = {}
+    for size in sizes:
+        # rendering doesn't care whether the board is solvable, so use stripes
+        regions = [j for _ in range(size) for j in range(size)]
+        board = Board.from_regions(regions, set(), size)
+
+        # a mid-game board, with queens on every other row and some X's
+        for i in range(size):
+            if i % 2 == 0:
+                board.get_tile((i, (2 * i) % size)).state = TileState.QUEEN
+            board.get_tile((i, (2 * i + 1) % size)).state = TileState.MARKED
+
+        tile = board.get_tile((0, size - 1))
+        frame_times = {"full": [], "one_tile": [], "idle": []}
+        for frame in range(frames):
+            renderer.invalidate()
+            t0 = time.perf_counter()
+            renderer.draw(board, 0, buttons)
+            frame_times["full"].append(time.perf_counter() - t0)
+
+            tile.state = TileState.MARKED if frame % 2 else TileState.EMPTY
+            t0 = time.perf_counter()
+            renderer.draw(board, 0, buttons)
+            frame_times["one_tile"].append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            renderer.draw(board, 0, buttons)
+            frame_times["idle"].append(time.perf_counter() - t0)
+
+        results[size] = {
+            kind: {
+                "median_seconds": statistics.median(times),
+                "p99_seconds": _percentile(times, 99),
+            }
+            for kind, times in frame_times.items()
+        }
+
+    pygame.quit()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generation and rendering")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(GRID_SIZES),
+        choices=GRID_SIZES,
+        help="Grid sizes to benchmark",
+    )
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=20,
+        help="Seconds to spend generating boards of each size",
+    )
+    parser.add_argument(
+        "--solver-boards",
+        type=int,
+        default=200,
+        help="Number of boards of each size to time the solvers and grader on",
+    )
+    parser.add_argument(
+        "--frames", type=int, default=200, help="Number of frames of each kind to draw"
+    )
+    parser.add_argument(
+        "--no-render", action="store_true", help="Skip the rendering benchmark"
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "-o", "--output", default="benchmark.json", help="JSON file for the results"
+    )
+    args = parser.parse_args()
+
+    results = {
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "args": vars(args),
+        "generation": {},
+        "solver": {},
+        "grading": {},
+    }
+
+    for size in args.sizes:
+        print(f"generating {size}x{size} boards", file=sys.stderr)
+        results["generation"][size] = benchmark_generation(
+            size, args.seconds, args.seed
+        )
+
+        print(f"solving {size}x{size} boards", file=sys.stderr)
+        results["solver"][size] = benchmark_solver(size, args.solver_boards, args.seed)
+
+        print(f"grading {size}x{size} boards", file=sys.stderr)
+        results["grading"][size] = benchmark_grading(
+            size, args.solver_boards, args.seed
+        )
+
+    if not args.no_render:
+        print("rendering", file=sys.stderr)
+        results["render"] = benchmark_render(args.sizes, args.frames)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"Wrote {args.output}", file=sys.stderr)
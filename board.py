@@ -1,30 +1,42 @@
 from tile import Tile, TileState
-from colors import Color, COLOR_TO_TUPLE
-from constants import GRID_SIZE, MIN_COLOR_SIZE_COUNTS
-from generate_queens import generate_random_board_posns, is_safe
+from colors import Color
+from constants import GRID_SIZE
+from puzzle import COLORINGS_PER_LAYOUT, Puzzle, generate_random_puzzles
+from coloring import color_layout
+from solver import count_solutions
 
 import random
-import time
-from math import atan2, pi
+from math import atan2, isqrt, pi
 
 
 class Board:
-    def __init__(self):
-        self._board = [[None for i in range(GRID_SIZE)] for j in range(GRID_SIZE)]
+    def __init__(self, size=GRID_SIZE):
+        self.size = size
+        self._board = [[None for i in range(size)] for j in range(size)]
         self.queen_posns = set()
         self.color_groups = {}
 
-        # for more efficient board generation
+        # running counts of the queens the user has placed, kept up to date by
+        # Tile.state so that is_solved doesn't have to scan the board
         self.color_queen_count = [0 for _ in range(len(Color))]
-        self.row_queen_count = [0 for _ in range(GRID_SIZE)]
+        self.row_queen_count = [0 for _ in range(size)]
+        self.col_queen_count = [0 for _ in range(size)]
+        self.queen_count = 0
+        # number of rows, columns and colors with more than one queen
+        self.overfull_count = 0
+        # number of pairs of touching queens
+        self.adjacent_queen_count = 0
+
+        # the hints.HintEngine tracking the player's moves, if there is one
+        self.hints = None
 
         for i in range(1, len(Color) + 1):
             self.color_groups[Color(i)] = set()
 
     def __repr__(self):
-        string = "board = Board()\n"
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
+        string = f"board = Board({self.size})\n"
+        for i in range(self.size):
+            for j in range(self.size):
                 string += (
                     f"board.set_tile(({i}, {j}), {repr(self._board[i][j])})" + "\n"
                 )
@@ -34,7 +46,7 @@ class Board:
     def get_tile(self, posn):
         x, y = posn
 
-        if x < 0 or x > GRID_SIZE or y < 0 or y > GRID_SIZE:
+        if x < 0 or x >= self.size or y < 0 or y >= self.size:
             raise ValueError(
                 f"Tried to access board out of bounds (position ({x}, {y}))"
             )
@@ -50,7 +62,7 @@ class Board:
     def set_tile(self, posn, tile):
         x, y = posn
 
-        if x < 0 or x > GRID_SIZE or y < 0 or y > GRID_SIZE:
+        if x < 0 or x >= self.size or y < 0 or y >= self.size:
             raise ValueError(f"Tried to set board out of bounds (position ({x}, {y}))")
 
         if tile.is_queen:
@@ -58,67 +70,60 @@ class Board:
         elif self._board[x][y] and self._board[x][y].is_queen:
             self.queen_posns.remove((x, y))
 
+        old_tile = self._board[x][y]
+        if old_tile and old_tile.state == TileState.QUEEN:
+            self._update_queen_counts(old_tile, -1)
+
         tile.board = self
         self._board[x][y] = tile
 
-    @staticmethod
-    # @profile
-    def _is_valid_queen_posn(board, posn):
-        row, col = posn
+        if tile.state == TileState.QUEEN:
+            self._update_queen_counts(tile, 1)
 
-        # Check this row on left side
-        if board.row_queen_count[row] > 0:
-            return False
+    def _update_queen_counts(self, tile, delta):
+        """Called when a queen is added to (delta = 1) or removed from (delta = -1) the
+        tile. Takes constant time"""
+        for counts, key in (
+            (self.row_queen_count, tile.x),
+            (self.col_queen_count, tile.y),
+            (self.color_queen_count, tile.color.value - 1),
+        ):
+            old_count = counts[key]
+            counts[key] += delta
+            self.overfull_count += (counts[key] > 1) - (old_count > 1)
 
-        # Check upper diagonal on left side
-        if board._board[max(row - 1, 0)][max(col - 1, 0)].state == TileState.QUEEN:
-            return False
+        self.queen_count += delta
 
-        # Check lower diagonal on left side
-        if (
-            board._board[min(row + 1, GRID_SIZE - 1)][max(col - 1, 0)]
-            == TileState.QUEEN
-        ):
-            return False
+        for i in range(max(tile.x - 1, 0), min(tile.x + 2, self.size)):
+            for j in range(max(tile.y - 1, 0), min(tile.y + 2, self.size)):
+                if (i, j) == (tile.x, tile.y):
+                    continue
 
-        return board.color_queen_count[board.get_tile(posn).color.value - 1] == 0
+                neighbor = self._board[i][j]
+                if neighbor and neighbor.state == TileState.QUEEN:
+                    self.adjacent_queen_count += delta
 
     # @profile
     def is_solved(self):
-        if all(
-            self.get_tile((i, j)).state == TileState.QUEEN for i, j in self.queen_posns
-        ):
-            return True
-
-        queen_count = 0
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                tile = self.get_tile((i, j))
-                if tile.state == TileState.QUEEN:
-                    queen_count += 1
-
-                    tile.state = TileState.EMPTY
-                    is_valid = Board._is_valid_queen_posn(self, (i, j))
-                    tile.state = TileState.QUEEN
-
-                    if not is_valid:
-                        return False
-
-        return queen_count == GRID_SIZE
+        return (
+            self.queen_count == self.size
+            and self.overfull_count == 0
+            and self.adjacent_queen_count == 0
+        )
 
     def copy(self):
-        board = Board()
+        board = Board(self.size)
 
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
+        for i in range(self.size):
+            for j in range(self.size):
                 board.set_tile((i, j), self.get_tile((i, j)).copy())
 
         return board
 
     def clear_colors(self):
         """All tile states must be EMPTY before calling this"""
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
+        for i in range(self.size):
+            for j in range(self.size):
                 self._board[i][j].color = None
 
         self.color_queen_count = [0 for _ in range(len(Color))]
@@ -126,16 +131,24 @@ class Board:
         for i in range(1, len(Color) + 1):
             self.color_groups[Color(i)] = set()
 
+    def to_regions(self):
+        """Returns the region id of every tile in row-major order, for the solver"""
+        return [
+            self._board[i][j].color.value - 1
+            for i in range(self.size)
+            for j in range(self.size)
+        ]
+
     def to_dict(self):
         board_dict = []
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
+        for i in range(self.size):
+            for j in range(self.size):
                 board_dict.append(self._board[i][j].to_dict())
 
         return board_dict
 
     def set_up_win_animation(self):
-        centroid_x, centroid_y = GRID_SIZE / 2, GRID_SIZE / 2
+        centroid_x, centroid_y = self.size / 2, self.size / 2
 
         angles = []
         for i, j in self.queen_posns:
@@ -155,7 +168,7 @@ class Board:
 
     @staticmethod
     def from_dict(d):
-        board = Board()
+        board = Board(isqrt(len(d)))
 
         for tile_d in d:
             tile = Tile.from_dict(tile_d)
@@ -164,174 +177,72 @@ class Board:
         return board
 
     @staticmethod
-    # @profile
-    def color_board(board):
-        color_frontier = []
-
-        # randomly color the queens
-        available_colors = list(COLOR_TO_TUPLE.keys())
-        for i, j in board.queen_posns:
-            tile = board.get_tile((i, j))
-            color = random.choice(available_colors)
-
-            tile.color = color
-            available_colors.remove(color)
-
-            # add tile into frontier, we will try to color the neighbors
-            color_frontier.append((color, {(i, j)}))
-            board.color_groups[color].add(tile)
-
-        # mapping of colors and the number of tiles that must have that color
-        size_constraints = {Color(i): 0 for i in range(1, len(Color) + 1)}
-        queen_posns = list(board.queen_posns)
-        for color_size, color_count in MIN_COLOR_SIZE_COUNTS.items():
-            for _ in range(color_count):
-                queen_posn = random.choice(queen_posns)
-                queen_tile = board.get_tile(queen_posn)
-
-                # subtract 1 because we colored the queen
-                size_constraints[queen_tile.color] = color_size - 1
-                queen_posns.remove(queen_posn)
-
-        uncolored_tiles = set()
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if not board.get_tile((i, j)).color:
-                    uncolored_tiles.add((i, j))
-
-        def posn_in_bounds(i, j):
-            return i >= 0 and i < GRID_SIZE and j >= 0 and j < GRID_SIZE
-
-        def get_neighbors(i, j):
-            neighbors = []
+    def from_regions(regions, queen_posns, size=GRID_SIZE):
+        """Builds a board from the region id of every tile in row-major order (as
+        returned by to_regions) and the positions of its queens"""
+        board = Board(size)
+
+        for i in range(size):
+            for j in range(size):
+                color = Color(regions[i * size + j] + 1)
+                tile = Tile(i, j, color, (i, j) in queen_posns, TileState.EMPTY)
+                board.set_tile((i, j), tile)
+                board.color_groups[color].add(tile)
 
-            if posn_in_bounds(i + 1, j):
-                neighbors.append((i + 1, j))
-
-            if posn_in_bounds(i - 1, j):
-                neighbors.append((i - 1, j))
-
-            if posn_in_bounds(i, j + 1):
-                neighbors.append((i, j + 1))
-
-            if posn_in_bounds(i, j - 1):
-                neighbors.append((i, j - 1))
-
-            return neighbors
-
-        while uncolored_tiles and len(color_frontier) > 0:
-            colors_to_remove = set()
-
-            # try to satisfy the largest remaining constraint
-            color_frontier.sort(reverse=True, key=lambda x: size_constraints[x[0]])
-            if size_constraints[color_frontier[0][0]] <= 0:
-                random.shuffle(color_frontier)
-
-            for color, posns in color_frontier:
-                if not posns:
-                    continue
-
-                posn = random.choice(tuple(posns))
-                posns.remove(posn)
-                i, j = posn
-
-                possible_tiles_to_color = [
-                    posn for posn in get_neighbors(i, j) if posn in uncolored_tiles
-                ]
-
-                if not possible_tiles_to_color:
-                    if not posns:
-                        colors_to_remove.add(color)
-
-                    # early stop if we can't satisfy constraints
-                    if size_constraints[color] > 0:
-                        return False
-
-                    continue
-
-                # decide whether to color a tile, randomly weighted by number of tiles with that color
-                percent_colored = len(board.color_groups[color]) / (GRID_SIZE**2)
-                percent_do_nothing = 1 - (1 - percent_colored) ** 3
-
-                if size_constraints[color] > 0:
-                    percent_do_nothing = 0
+        return board
 
-                if random.uniform(0, 1) < percent_do_nothing:
-                    posns.add((i, j))
-                else:
-                    posn_to_color = random.choice(possible_tiles_to_color)
-                    tile_to_color = board.get_tile(posn_to_color)
-                    tile_to_color.color = color
-                    board.color_groups[color].add(tile_to_color)
-                    uncolored_tiles.remove(posn_to_color)
-                    size_constraints[color] -= 1
+    @staticmethod
+    def from_puzzle(puzzle):
+        return Board.from_regions(puzzle.regions, set(puzzle.queen_posns), puzzle.size)
 
-                    posns.add(posn_to_color)
+    def to_puzzle(self):
+        solution = [0 for _ in range(self.size)]
+        for i, j in self.queen_posns:
+            solution[i] = j
 
-                # there are other neighbors of (i, j) that are uncolored
-                if len(possible_tiles_to_color) > 1:
-                    posns.add((i, j))
+        return Puzzle(self.size, self.to_regions(), solution)
 
-                if not posns:
-                    colors_to_remove.add(color)
+    @staticmethod
+    # @profile
+    def color_board(board, rng=random):
+        """Randomly colors a board that has its queens placed. Returns whether it
+        succeeded (see coloring.color_layout)"""
+        solution = [0 for _ in range(board.size)]
+        for i, j in board.queen_posns:
+            solution[i] = j
 
-                if size_constraints[color] > 0:
-                    break
+        regions = color_layout(solution, board.size, rng)
+        if regions is None:
+            return False
 
-            color_frontier = [x for x in color_frontier if x[0] not in colors_to_remove]
+        board.clear_colors()
+        for i in range(board.size):
+            for j in range(board.size):
+                tile = board._board[i][j]
+                tile.color = Color(regions[i * board.size + j] + 1)
+                board.color_groups[tile.color].add(tile)
 
-        return len(uncolored_tiles) == 0
+        return True
 
     @staticmethod
     # @profile
-    def has_multiple_solutions(board, col=0):
+    def has_multiple_solutions(board):
         """This function returns a number. It pre-emptively stops when it has more than one
         solution and just returns the number of solutions found at the stop"""
-        if col >= GRID_SIZE:
-            return board.is_solved()
-
-        num_solutions = 0
-        for i in range(GRID_SIZE):
-            if Board._is_valid_queen_posn(board, (i, col)):
-                board.get_tile((i, col)).state = TileState.QUEEN
-                num_solutions += Board.has_multiple_solutions(board, col + 1)
-                board.get_tile((i, col)).state = TileState.EMPTY
+        return count_solutions(board.to_regions(), board.size)
 
-            if num_solutions > 1:
-                return num_solutions
-
-        return num_solutions
+    @staticmethod
+    def generate_random_boards(
+        size=GRID_SIZE, num_colorings=COLORINGS_PER_LAYOUT, rng=random
+    ):
+        return [
+            Board.from_puzzle(puzzle)
+            for puzzle in generate_random_puzzles(size, num_colorings, rng)
+        ]
 
     @staticmethod
-    # @profile
-    def generate_random_board():
-        iters = 0
-        board = Board()
-        t0 = time.time()
-        while True:
-            if iters % 10 == 0:
-                board = Board()
-                queen_posns = set(generate_random_board_posns())
-
-                for i in range(GRID_SIZE):
-                    for j in range(GRID_SIZE):
-                        if (i, j) in queen_posns:
-                            board.set_tile(
-                                (i, j), Tile(i, j, None, True, TileState.EMPTY)
-                            )
-                        else:
-                            board.set_tile(
-                                (i, j), Tile(i, j, None, False, TileState.EMPTY)
-                            )
-
-            board.clear_colors()
-            if Board.color_board(board):
-                sols = Board.has_multiple_solutions(board)
-                if sols == 1:
-                    print(f"Took {iters} iters {time.time() - t0} seconds")
-                    return board
-
-            iters += 1
+    def generate_random_board(size=GRID_SIZE, rng=random):
+        return Board.generate_random_boards(size, rng=rng)[0]
 
 
 if __name__ == "__main__":
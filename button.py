@@ -11,6 +11,11 @@ class Button:
         self.button_rect = pygame.Rect((0, 0), button_size)
         self.text_rect.center = self.button_rect.center
 
+    def set_text(self, text_str):
+        self.text_str = text_str
+        self.text_rect = self.font.get_rect(text_str)
+        self.text_rect.center = self.button_rect.center
+
     def set_position(self, posn):
         self.button_rect.center = posn
         self.text_rect.center = self.button_rect.center
@@ -0,0 +1,233 @@
+# region-growing coloring of a queen layout
+#
+# every queen starts a region. regions that MIN_COLOR_SIZE_COUNTS says must reach a
+# certain size grow first, biggest requirement first, and then every region grows at
+# random until the board is full. a growth step that leaves another region that still
+# needs cells with nowhere to grow is undone and that cell is ruled out for the
+# region. if a region ends up with nowhere to grow itself, the last few growth steps
+# are undone and retried with different random choices, so one bad step doesn't throw
+# away the whole coloring
+
+from constants import GRID_SIZE, MIN_COLOR_SIZE_COUNTS
+import metrics
+
+import random
+
+# growth steps undone when a region that needs more cells gets stuck, and how many
+# times that can happen before the coloring is given up
+ROLLBACK_STEPS = 4
+MAX_ROLLBACKS = 20
+
+# for each grid size, the flat index of every cell's orthogonal neighbors
+_neighbors = {}
+
+
+def get_neighbors(size):
+    if size not in _neighbors:
+        neighbors = []
+        for i in range(size):
+            for j in range(size):
+                cells = []
+                if i + 1 < size:
+                    cells.append((i + 1) * size + j)
+                if i > 0:
+                    cells.append((i - 1) * size + j)
+                if j + 1 < size:
+                    cells.append(i * size + j + 1)
+                if j > 0:
+                    cells.append(i * size + j - 1)
+
+                neighbors.append(tuple(cells))
+
+        _neighbors[size] = neighbors
+
+    return _neighbors[size]
+
+
+class _Coloring:
+    """Regions being grown on one board. frontier[r] holds the uncolored cells next
+    to region r, along with repeats and cells that have been colored since, which are
+    dropped as they're found"""
+
+    def __init__(self, solution, size, rng, min_sizes):
+        self.size = size
+        self.rng = rng
+        self.neighbors = get_neighbors(size)
+
+        self.regions = [-1 for _ in range(size * size)]
+        self.region_sizes = [1 for _ in range(size)]
+        self.uncolored = size * size - size
+
+        # colored cells in the order they were colored, so steps can be undone
+        self.history = []
+
+        region_ids = list(range(size))
+        rng.shuffle(region_ids)
+        for i, j in enumerate(solution):
+            self.regions[i * size + j] = region_ids[i]
+
+        # number of cells each region still needs
+        self.needs = [0 for _ in range(size)]
+        unconstrained = list(region_ids)
+        for region_size, region_count in min_sizes.items():
+            for _ in range(region_count):
+                region = rng.choice(unconstrained)
+
+                # subtract 1 because we colored the queen
+                self.needs[region] = region_size - 1
+                unconstrained.remove(region)
+
+        self._build_frontiers()
+
+    def _build_frontiers(self):
+        self.frontier = [[] for _ in range(self.size)]
+        for cell, region in enumerate(self.regions):
+            if region >= 0:
+                self.frontier[region].extend(
+                    n for n in self.neighbors[cell] if self.regions[n] < 0
+                )
+
+        # cells ruled out for a region until the next rollback
+        self.ruled_out = set()
+
+    def pick(self, region):
+        """Returns a random uncolored cell next to `region`, or None if there isn't
+        one"""
+        frontier = self.frontier[region]
+        while frontier:
+            k = self.rng.randrange(len(frontier))
+            cell = frontier[k]
+            if self.regions[cell] < 0 and (region, cell) not in self.ruled_out:
+                return cell
+
+            # drop it by swapping in the last cell
+            frontier[k] = frontier[-1]
+            frontier.pop()
+
+        return None
+
+    def can_grow(self, region):
+        frontier = self.frontier[region]
+        while frontier:
+            cell = frontier[-1]
+            if self.regions[cell] < 0 and (region, cell) not in self.ruled_out:
+                return True
+
+            frontier.pop()
+
+        return False
+
+    def color(self, cell, region):
+        self.regions[cell] = region
+        self.region_sizes[region] += 1
+        self.needs[region] -= 1
+        self.uncolored -= 1
+        self.history.append(cell)
+
+        self.frontier[region].extend(
+            n for n in self.neighbors[cell] if self.regions[n] < 0
+        )
+
+    def uncolor_last(self):
+        """Undoes the last color call. The region's frontier keeps the cells that call
+        added"""
+        cell = self.history.pop()
+        region = self.regions[cell]
+
+        self.regions[cell] = -1
+        self.region_sizes[region] -= 1
+        self.needs[region] += 1
+        self.uncolored += 1
+
+    def starves_neighbor(self, cell, region):
+        """Whether coloring `cell` left a neighboring region that still needs cells
+        with nowhere to grow"""
+        for n in self.neighbors[cell]:
+            other = self.regions[n]
+            if other >= 0 and other != region and self.needs[other] > 0:
+                if not self.can_grow(other):
+                    return True
+
+        return False
+
+    def rollback(self):
+        for _ in range(min(ROLLBACK_STEPS, len(self.history))):
+            self.uncolor_last()
+
+        self._build_frontiers()
+
+    def grow_required(self):
+        """Grows every region to the size it needs. Returns whether that worked"""
+        rollbacks = 0
+        while True:
+            region = max(range(self.size), key=self.needs.__getitem__)
+            if self.needs[region] <= 0:
+                return True
+
+            cell = self.pick(region)
+            if cell is None:
+                rollbacks += 1
+                metrics.count("coloring.rollbacks")
+                if rollbacks > MAX_ROLLBACKS or not self.history:
+                    return False
+
+                self.rollback()
+                continue
+
+            frontier_size = len(self.frontier[region])
+            self.color(cell, region)
+            if self.starves_neighbor(cell, region):
+                # put the region back the way it was. checking the neighbors may
+                # have dropped the cell from their frontiers while it was colored
+                self.uncolor_last()
+                del self.frontier[region][frontier_size:]
+                self.ruled_out.add((region, cell))
+
+                for n in self.neighbors[cell]:
+                    if self.regions[n] >= 0 and self.regions[n] != region:
+                        self.frontier[self.regions[n]].append(cell)
+
+    def grow_rest(self):
+        """Grows random regions until every cell is colored. Bigger regions are more
+        likely to skip their turn"""
+        # cells ruled out while growing the required regions are fair game now
+        self._build_frontiers()
+
+        growing = list(range(self.size))
+        num_cells = self.size * self.size
+
+        while self.uncolored:
+            k = self.rng.randrange(len(growing))
+            region = growing[k]
+
+            cell = self.pick(region)
+            if cell is None:
+                growing[k] = growing[-1]
+                growing.pop()
+                continue
+
+            percent_colored = self.region_sizes[region] / num_cells
+            percent_do_nothing = 1 - (1 - percent_colored) ** 3
+            if self.rng.random() >= percent_do_nothing:
+                self.color(cell, region)
+
+
+def color_layout(solution, size=GRID_SIZE, rng=random, min_sizes=None):
+    """Randomly grows one region out of each queen in `solution` (the column of the
+    queen in each row) until every tile has a region. Returns the region id of every
+    tile in row-major order, or None if the regions couldn't meet `min_sizes` (a dict
+    of region size to the number of regions that must be at least that big, defaults
+    to MIN_COLOR_SIZE_COUNTS for the size)"""
+    if min_sizes is None:
+        min_sizes = MIN_COLOR_SIZE_COUNTS[size]
+
+    metrics.count("coloring.attempts")
+    coloring = _Coloring(solution, size, rng, min_sizes)
+
+    if not coloring.grow_required():
+        metrics.count("coloring.failed.stuck")
+        return None
+
+    coloring.grow_rest()
+    metrics.count("coloring.succeeded")
+    return coloring.regions
@@ -10,6 +10,10 @@ class Color(Enum):
     PURPLE = 6
     MAGENTA = 7
     GRAY = 8
+    YELLOW = 9
+    PINK = 10
+    BROWN = 11
+    OLIVE = 12
 
 
 # TODO
@@ -22,4 +26,8 @@ COLOR_TO_TUPLE = {
     Color.PURPLE: (182, 166, 221),
     Color.MAGENTA: (203, 163, 187),
     Color.GRAY: (224, 224, 224),
+    Color.YELLOW: (250, 235, 140),
+    Color.PINK: (245, 175, 210),
+    Color.BROWN: (196, 164, 132),
+    Color.OLIVE: (176, 186, 116),
 }
@@ -9,9 +9,24 @@ SCREEN_HEIGHT = 600
 
 LINE_THICKNESS = 4
 
+# default grid size, and every grid size a board can have (one color per row, so at
+# most len(Color))
 GRID_SIZE = 8
+GRID_SIZES = (8, 9, 10, 11, 12)
 
 FPS = 60
 
-# make sure we have 1 really big color and that none of the colors are single squares
-MIN_COLOR_SIZE_COUNTS = {25: 1, 2: 7}
+# number of boards of each size to keep ready, and seconds to wait for a new board
+# before replaying an old one instead
+PREFETCH_DEPTH = 5
+NEW_GAME_REPLAY_DELAY = 5
+
+# make sure we have 1 really big color and that none of the colors are single squares,
+# for each grid size
+MIN_COLOR_SIZE_COUNTS = {
+    8: {25: 1, 2: 7},
+    9: {32: 1, 2: 8},
+    10: {39: 1, 2: 9},
+    11: {47: 1, 2: 10},
+    12: {56: 1, 2: 11},
+}
@@ -0,0 +1,288 @@
+# grading how hard a board is to solve by hand
+#
+# the grader solves a board the way a player would. after every step it goes back to
+# the cheapest deduction rule and only moves on to a costlier one when nothing cheaper
+# makes progress. a board's tier is set by the hardest rule it needed, and its score
+# adds up the cost of every step. cells and units (rows, columns and regions) are
+# bitmasks over the board, so a whole grade takes a few milliseconds
+
+from constants import GRID_SIZE
+
+from itertools import combinations
+
+# the deduction rules, cheapest first:
+#   last_cell: a row, column or region has one cell left, so it holds a queen
+#   confined: a region's cells all lie in one row or column (or a line's cells in one
+#     region), so the rest of that row, column or region can't hold a queen
+#   attack: a queen on a cell would rule out every cell left in some row, column or
+#     region, so that cell can't hold a queen
+#   group: N regions only have cells in N rows or columns, so those rows or columns
+#     belong to them
+#   contradiction: a queen on a cell leads to a dead end by the cheap rules alone
+RULES = ("last_cell", "confined", "attack", "group", "contradiction")
+RULE_COSTS = {
+    "last_cell": 1,
+    "confined": 2,
+    "attack": 4,
+    "group": 8,
+    "contradiction": 20,
+}
+
+# the tier a board lands in when it needs a rule, and the tier of boards the rules
+# can't solve at all
+TIERS = ("easy", "medium", "hard", "expert")
+RULE_TIERS = {
+    "last_cell": "easy",
+    "confined": "easy",
+    "attack": "medium",
+    "group": "hard",
+    "contradiction": "expert",
+}
+UNSOLVED_TIER = "expert"
+
+
+class Grade:
+    __slots__ = ("tier", "score", "steps", "rules", "solved")
+
+    def __init__(self, tier, score, steps, rules, solved):
+        self.tier = tier
+        self.score = score
+        self.steps = steps
+        self.rules = rules
+        self.solved = solved
+
+    def __repr__(self):
+        return (
+            f"Grade({self.tier!r}, score={self.score}, steps={self.steps}, "
+            f"rules={self.rules!r}, solved={self.solved})"
+        )
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+class _Grid:
+    """The cells that can still hold a queen (`cand`) and the queens placed so far,
+    on top of masks that never change while grading a board"""
+
+    __slots__ = ("size", "rows", "cols", "regions", "attack", "cand", "queens")
+
+    def __init__(self, regions, size):
+        self.size = size
+        self.rows = [((1 << size) - 1) << (i * size) for i in range(size)]
+        self.cols = [sum(1 << (i * size + j) for i in range(size)) for j in range(size)]
+        self.regions = [0 for _ in range(size)]
+        for cell, region in enumerate(regions):
+            self.regions[region] |= 1 << cell
+
+        # every cell a queen on the cell rules out, not counting the cell itself
+        self.attack = {}
+        for i in range(size):
+            for j in range(size):
+                cell = 1 << (i * size + j)
+                mask = self.rows[i] | self.cols[j] | self.regions[regions[i * size + j]]
+                for di in (-1, 0, 1):
+                    for dj in (-1, 0, 1):
+                        if 0 <= i + di < size and 0 <= j + dj < size:
+                            mask |= 1 << ((i + di) * size + j + dj)
+
+                self.attack[cell] = mask & ~cell
+
+        self.cand = (1 << (size * size)) - 1
+        self.queens = 0
+
+    def copy(self):
+        grid = _Grid.__new__(_Grid)
+        for name in _Grid.__slots__:
+            setattr(grid, name, getattr(self, name))
+
+        return grid
+
+    def place(self, cell):
+        self.queens |= cell
+        self.cand &= ~(self.attack[cell] | cell)
+
+    def open_units(self, units):
+        return [unit for unit in units if not unit & self.queens]
+
+    def is_dead_end(self):
+        """Whether a row, column or region without a queen has no cells left"""
+        for units in (self.rows, self.cols, self.regions):
+            for unit in units:
+                if not unit & (self.cand | self.queens):
+                    return True
+
+        return False
+
+    def is_solved(self):
+        return bin(self.queens).count("1") == self.size
+
+
+def _last_cell(grid):
+    for units in (grid.regions, grid.rows, grid.cols):
+        for unit in grid.open_units(units):
+            cells = unit & grid.cand
+            if cells and not cells & (cells - 1):
+                grid.place(cells)
+                return True
+
+    return False
+
+
+def _confined(grid):
+    regions = grid.open_units(grid.regions)
+    lines = grid.open_units(grid.rows) + grid.open_units(grid.cols)
+
+    for inner, outer in ((regions, lines), (lines, regions)):
+        for unit in inner:
+            cells = unit & grid.cand
+            for other in outer:
+                ruled_out = other & grid.cand & ~unit
+                if ruled_out and not cells & ~other:
+                    grid.cand &= ~ruled_out
+                    return True
+
+    return False
+
+
+def _attack(grid):
+    units = (
+        grid.open_units(grid.regions)
+        + grid.open_units(grid.rows)
+        + grid.open_units(grid.cols)
+    )
+
+    ruled_out = 0
+    for cell in _bits(grid.cand):
+        left = grid.cand & ~grid.attack[cell]
+        for unit in units:
+            if not unit & cell and not unit & left:
+                ruled_out |= cell
+                break
+
+    grid.cand &= ~ruled_out
+    return bool(ruled_out)
+
+
+def _group(grid):
+    regions = grid.open_units(grid.regions)
+
+    # only groups of up to half the open regions need checking. if N regions fit in
+    # N rows, the other rows only have cells of the other regions, which is the same
+    # deduction seen from the rows' side
+    for lines in (grid.open_units(grid.rows), grid.open_units(grid.cols)):
+        for inner, outer in ((regions, lines), (lines, regions)):
+            # which of the outer units each inner unit has cells in
+            touches = []
+            for unit in inner:
+                cells = unit & grid.cand
+                touches.append(
+                    sum(1 << k for k, other in enumerate(outer) if other & cells)
+                )
+
+            for n in range(2, len(inner) // 2 + 1):
+                for group in combinations(range(len(inner)), n):
+                    touched = 0
+                    for k in group:
+                        touched |= touches[k]
+                    if bin(touched).count("1") != n:
+                        continue
+
+                    group_cells = 0
+                    for k in group:
+                        group_cells |= inner[k]
+
+                    ruled_out = 0
+                    for k in _bits(touched):
+                        ruled_out |= outer[k.bit_length() - 1]
+                    ruled_out &= grid.cand & ~group_cells
+
+                    if ruled_out:
+                        grid.cand &= ~ruled_out
+                        return True
+
+    return False
+
+
+# the rules tried when testing a cell for a contradiction
+_CHEAP_RULES = (_last_cell, _confined)
+
+
+def _contradiction(grid):
+    for cell in _bits(grid.cand):
+        test = grid.copy()
+        test.place(cell)
+        while not test.is_dead_end() and any(rule(test) for rule in _CHEAP_RULES):
+            pass
+
+        if test.is_dead_end():
+            grid.cand &= ~cell
+            return True
+
+    return False
+
+
+_RULE_FUNCTIONS = {
+    "last_cell": _last_cell,
+    "confined": _confined,
+    "attack": _attack,
+    "group": _group,
+    "contradiction": _contradiction,
+}
+
+
+def find_step(regions, size, cand, queens):
+    """Finds the cheapest deduction on a partly solved board, where `cand` and
+    `queens` are bitmasks (bit i * size + j) of the cells that could still hold a
+    queen and of the queens placed so far. Returns the rule's name and bitmasks of
+    the queens it places and the cells it rules out, or None if no rule makes
+    progress"""
+    grid = _Grid(regions, size)
+    grid.cand = cand
+    grid.queens = queens
+
+    for name in RULES:
+        if _RULE_FUNCTIONS[name](grid):
+            placed = grid.queens & ~queens
+            ruled_out = 0 if placed else cand & ~grid.cand
+            return name, placed, ruled_out
+
+    return None
+
+
+def grade_regions(regions, size=GRID_SIZE):
+    """Solves the coloring `regions` (region ids in row-major order) with the rules in
+    RULES and returns its Grade. `rules` counts the steps each rule took"""
+    grid = _Grid(regions, size)
+    rules = {}
+
+    while not grid.is_solved() and not grid.is_dead_end():
+        for name in RULES:
+            if _RULE_FUNCTIONS[name](grid):
+                rules[name] = rules.get(name, 0) + 1
+                break
+        else:
+            break
+
+    solved = grid.is_solved()
+    if solved:
+        hardest = max(rules, key=RULES.index, default="last_cell")
+        tier = RULE_TIERS[hardest]
+    else:
+        tier = UNSOLVED_TIER
+
+    return Grade(
+        tier,
+        sum(RULE_COSTS[name] * count for name, count in rules.items()),
+        sum(rules.values()),
+        rules,
+        solved,
+    )
+
+
+def grade_puzzle(puzzle):
+    return grade_regions(puzzle.regions, puzzle.size)
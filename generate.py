@@ -0,0 +1,123 @@
+# headless bulk board generation, e.g.
+#   python3 generate.py -n 100000 -o boards.jsonl --seed 1 --workers 8
+# every line of the output file is one board as a JSON object: the grid size, the
+# seed, batch index and big region scale puzzle.generate_puzzle rebuilds it from, its
+# difficulty tier and the board itself in the same format as Board.to_dict()
+
+from constants import GRID_SIZE, GRID_SIZES
+from generator import GeneratorPool
+from bank import decode_puzzle, record_origin, record_tier
+from difficulty import TIERS
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Queue
+
+
+def generate(
+    num_boards,
+    output_path,
+    seed=None,
+    size=GRID_SIZE,
+    num_workers=None,
+    collect_metrics=False,
+    tiers=TIERS,
+):
+    """Generates `num_boards` boards of the difficulty `tiers` across worker
+    processes, writing each one to `output_path` as soon as it is done. With
+    `collect_metrics`, the workers' counters are printed as JSON at the end"""
+    num_workers = num_workers or os.cpu_count() or 1
+    board_q = Queue(4 * num_workers)
+    kill_q = Queue()
+    # every tier shares the one queue
+    pool = GeneratorPool(
+        {size: {tier: board_q for tier in tiers}},
+        kill_q,
+        num_workers,
+        seed=seed,
+        verbose=False,
+        collect_metrics=collect_metrics,
+    )
+    pool.start()
+
+    t0 = time.time()
+    try:
+        with open(output_path, "w") as f:
+            for count in range(1, num_boards + 1):
+                _, record = board_q.get()
+                seed, index, scale = record_origin(record)
+                line = {
+                    "size": size,
+                    "seed": seed,
+                    "index": index,
+                    "scale": scale,
+                    "tier": record_tier(record),
+                    "board": decode_puzzle(record, size).to_dict(),
+                }
+                f.write(json.dumps(line) + "\n")
+                f.flush()
+
+                if count % 100 == 0 or count == num_boards:
+                    elapsed = time.time() - t0
+                    print(
+                        f"{count}/{num_boards} boards ({count / elapsed:.1f} boards/s)",
+                        file=sys.stderr,
+                    )
+
+        if collect_metrics:
+            print(json.dumps(pool.get_metrics(), indent=2), file=sys.stderr)
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate boards without the UI")
+    parser.add_argument(
+        "-n", "--num-boards", type=int, required=True, help="Number of boards"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="JSONL file to write boards to"
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=None, help="Seed for the workers' randomness"
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=GRID_SIZE,
+        choices=GRID_SIZES,
+        help="Grid size of the boards",
+    )
+    parser.add_argument(
+        "--difficulty",
+        nargs="+",
+        default=list(TIERS),
+        choices=TIERS,
+        help="Difficulty tiers of the boards (defaults to all of them)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes generating boards (defaults to the CPU count)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Print the generation counters and stage times when done",
+    )
+    args = parser.parse_args()
+
+    generate(
+        args.num_boards,
+        args.output,
+        args.seed,
+        args.size,
+        args.workers,
+        args.metrics,
+        args.difficulty,
+    )
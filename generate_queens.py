@@ -1,109 +1,75 @@
 # helper functions for randomly generating a board that satisfies the N-queens problem
-# https://www.geeksforgeeks.org/python-program-for-n-queen-problem-backtracking-3/
+# (one queen per row and column, and no two queens touching, even diagonally)
 
 from constants import GRID_SIZE
+from layouts import LAYOUT_INDEX_MAX_SIZE, get_layout_index
 import random
 
+# for each grid size, the number of ways to fill the remaining rows of a layout given
+# the columns used so far (as a bitmask) and the column of the queen in the last row
+_completion_counts = {}
 
-def copy_board(board):
-    return [row.copy() for row in board]
 
+def _get_completion_counter(size):
+    if size in _completion_counts:
+        return _completion_counts[size]
 
-def print_board(board):
-    for row in board:
-        print(" ".join(map(str, row)))
+    full = (1 << size) - 1
+    counts = {}
 
+    def count(used_cols, last_col):
+        if used_cols == full:
+            return 1
 
-def is_safe(board, row, col):
-    # Check this row on left side
-    for i in range(col):
-        if board[row][i]:
-            return False
+        key = (used_cols, last_col)
+        if key not in counts:
+            counts[key] = sum(
+                count(used_cols | (1 << j), j)
+                for j in range(size)
+                if not used_cols & (1 << j) and abs(j - last_col) > 1
+            )
 
-    # Check upper diagonal on left side
-    if board[max(row - 1, 0)][max(col - 1, 0)]:
-        return False
+        return counts[key]
 
-    # Check lower diagonal on left side
-    if board[min(row + 1, GRID_SIZE - 1)][max(col - 1, 0)] == 1:
-        return False
+    # the first row has no queen above it
+    count(0, -2)
 
-    return True
+    _completion_counts[size] = count
+    return count
 
 
-def solve_NQ_until(board, col):
-    if col >= GRID_SIZE:
-        return True
+def count_layouts(size=GRID_SIZE):
+    """Returns the number of valid queen layouts on a board of `size`"""
+    count = _get_completion_counter(size)
+    return count(0, -2)
 
-    # Consider this column and try placing
-    # this queen in all rows one by one
-    for i in range(GRID_SIZE):
 
-        if is_safe(board, i, col):
-            # Place this queen in board[i][col]
-            board[i][col] = 1
+def random_layout(size=GRID_SIZE, rng=random):
+    """Draws a valid queen layout uniformly at random. Returns a list where the i-th
+    entry is the column of the queen in row i"""
+    count = _get_completion_counter(size)
 
-            # recur to place rest of the queens
-            if solve_NQ_until(board, col + 1):
-                return True
+    cols = []
+    used_cols, last_col = 0, -2
+    for _ in range(size):
+        # pick the next column weighted by how many layouts it leads to
+        options = [
+            j for j in range(size) if not used_cols & (1 << j) and abs(j - last_col) > 1
+        ]
+        weights = [count(used_cols | (1 << j), j) for j in options]
 
-            # If placing queen in board[i][col]
-            # doesn't lead to a solution, then
-            # queen from board[i][col]
-            board[i][col] = 0
+        last_col = rng.choices(options, weights)[0]
+        used_cols |= 1 << last_col
+        cols.append(last_col)
 
-    # if the queen can not be placed in any row in
-    # this column col  then return false
-    return False
+    return cols
 
 
-def random_solve_NQ_until(board, col):
-    if col >= GRID_SIZE:
-        return board
-
-    valid_boards = []
-    for i in range(GRID_SIZE):
-        if is_safe(board, i, col):
-            board_copy = copy_board(board)
-            board_copy[i][col] = 1
-
-            # if a feasible solution exists...
-            if solve_NQ_until(copy_board(board_copy), col + 1):
-                valid_boards.append(board_copy)
-                continue
-
-    if not valid_boards:
-        return None
+def generate_random_board_posns(size=GRID_SIZE, rng=random):
+    # small sizes pick straight from the index of every layout
+    if size <= LAYOUT_INDEX_MAX_SIZE:
+        cols = get_layout_index(size).sample(rng)
     else:
-        # choose a random board
-        random_board = random.choice(valid_boards)
-
-        # solve rest of puzzle (randomly)
-        random_solved_board = random_solve_NQ_until(random_board, col + 1)
-        return random_solved_board
-
-
-def generate_random_board_posns():
-    board = None
-    while not board:
-        # keep trying to generate board until it works
-        empty_board = [[0 for i in range(GRID_SIZE)] for j in range(GRID_SIZE)]
-        board = random_solve_NQ_until(empty_board, 0)
-
-    # sanity check
-    for i in range(len(board)):
-        for j in range(len(board[i])):
-            if not board[i][j]:
-                continue
-
-            board[i][j] = 0
-            assert is_safe(board, i, j)
-            board[i][j] = 1
-
-    posns = []
-    for i in range(len(board)):
-        for j in range(len(board[i])):
-            if board[i][j]:
-                posns.append((i, j))
-
-    return posns
+        cols = random_layout(size, rng)
+
+    return [(i, j) for i, j in enumerate(cols)]
@@ -0,0 +1,317 @@
+# pool of worker processes that generate boards in the background
+
+from puzzle import generate_random_puzzles
+from bank import PuzzleBank, encode_puzzle, get_bank_path
+from difficulty import grade_puzzle
+from steering import TierSteering, scale_min_sizes
+import metrics
+
+import os
+import random
+import time
+from collections import deque
+from multiprocessing import Event, Process, Queue
+from queue import Empty, Full
+
+
+def _is_killed(kill_q):
+    try:
+        kill_q.get_nowait()
+        return True
+    except Empty:
+        return False
+
+
+def _sync_metrics(worker_id, metrics_on, metrics_request, metrics_q):
+    # metrics can be switched on and off while we run, and the pool asks for them by
+    # setting our request event
+    metrics.enable(metrics_on.is_set())
+    if metrics_request.is_set():
+        metrics_request.clear()
+        metrics_q.put((worker_id, metrics.snapshot()))
+
+
+def queue_level(board_q):
+    """The number of boards in `board_q`. qsize isn't available on macOS, where an
+    empty queue counts as 0 boards and any other queue as 1, so empty queues still
+    come first"""
+    try:
+        return board_q.qsize()
+    except NotImplementedError:
+        return 0 if board_q.empty() else 1
+
+
+def _flush(pending):
+    """Puts as many of the boards waiting in `pending` (a dict of queue to a deque of
+    queue items) into their queues as fit, oldest first"""
+    for board_q, items in pending.items():
+        while items:
+            try:
+                board_q.put_nowait(items[0])
+            except Full:
+                break
+
+            items.popleft()
+
+
+def _generate_boards_in_background(
+    board_qs,
+    kill_q,
+    worker_id,
+    seed,
+    verbose,
+    bank_dir,
+    metrics_on,
+    metrics_request,
+    metrics_q,
+):
+    # every worker draws from its own stream. forked workers would otherwise share
+    # the parent's random state
+    rng = random.Random(None if seed is None else f"{seed}:{worker_id}")
+
+    def log(message):
+        if verbose:
+            print(f"Worker {worker_id} {message}")
+
+    def sync_metrics():
+        _sync_metrics(worker_id, metrics_on, metrics_request, metrics_q)
+
+    # every board is saved as soon as it's done, so none are lost if we die
+    banks = {}
+    if bank_dir:
+        for size in board_qs:
+            banks[size] = PuzzleBank(get_bank_path(bank_dir, size), size)
+
+    steering = TierSteering()
+
+    # boards that weren't banked and didn't fit in their queue yet. they're handed
+    # over before anything else rather than dropped, so what a worker makes doesn't
+    # depend on how fast its boards are taken
+    pending = {}
+
+    # workers start on different queues so they don't all fill the same one first
+    turn = worker_id
+
+    while True:
+        sync_metrics()
+
+        # check if we have been killed :(
+        if _is_killed(kill_q):
+            log("dying!")
+            return
+
+        _flush(pending)
+
+        # go after the emptiest queue with room, taking turns between ties
+        wanted = [
+            (size, tier)
+            for size, tier_qs in board_qs.items()
+            for tier, board_q in tier_qs.items()
+            if not board_q.full() and not pending.get(board_q)
+        ]
+        if not wanted:
+            time.sleep(0.1 if any(pending.values()) else 0.5)
+            continue
+
+        k = turn % len(wanted)
+        size, tier = min(
+            wanted[k:] + wanted[:k],
+            key=lambda size_tier: queue_level(board_qs[size_tier[0]][size_tier[1]]),
+        )
+        turn += 1
+
+        log(f"generating {tier} {size}x{size} boards!")
+        t0 = time.time()
+
+        # one round at a time, so we can be killed or asked for metrics in between.
+        # boards of other tiers that turn up along the way are kept too
+        while True:
+            sync_metrics()
+            if _is_killed(kill_q):
+                log("dying!")
+                return
+
+            # the scale is picked again every round, so a hunt isn't stuck with a
+            # scale that turns out to rarely give the tier
+            scale = steering.choose_scale(size, tier)
+            min_sizes = scale_min_sizes(size, scale)
+            metrics.count(f"steering.scale.{scale}")
+
+            # each round gets its own seed, so every puzzle it gives can be rebuilt
+            # with puzzle.generate_puzzle(size, round_seed, k, scale)
+            round_seed = rng.getrandbits(64)
+            puzzles = generate_random_puzzles(
+                size,
+                rng=random.Random(round_seed),
+                max_rounds=1,
+                min_sizes=min_sizes,
+            )
+            origins = [(round_seed, k, scale) for k in range(len(puzzles))]
+
+            with metrics.timed("generate.grading"):
+                tiers = [grade_puzzle(puzzle).tier for puzzle in puzzles]
+            for puzzle_tier in tiers:
+                metrics.count(f"difficulty.{puzzle_tier}")
+            steering.record(size, scale, tiers)
+
+            # bank the whole round first, so boards we die before queueing aren't lost
+            indices = [None for _ in puzzles]
+            if size in banks:
+                for k, (puzzle, puzzle_tier) in enumerate(zip(puzzles, tiers)):
+                    indices[k] = banks[size].append(puzzle, puzzle_tier, origins[k])
+
+            # puzzles cross the queue as bank records, which pickle to a few dozen
+            # bytes
+            for index, puzzle, puzzle_tier, origin in zip(
+                indices, puzzles, tiers, origins
+            ):
+                board_q = board_qs[size].get(puzzle_tier)
+                if board_q is None:
+                    continue
+
+                item = (index, encode_puzzle(puzzle, puzzle_tier, origin))
+                if index is None:
+                    pending.setdefault(board_q, deque()).append(item)
+                    continue
+
+                # a banked board that doesn't fit is still found by BoardSupply
+                try:
+                    board_q.put_nowait(item)
+                except Full:
+                    pass
+
+            _flush(pending)
+
+            # keep going until the tier we're after turns up, however full its queue
+            # has got in the meantime
+            if tier in tiers:
+                log(f"done generating {tier} boards in {time.time() - t0:.2f}s!")
+                break
+
+
+class GeneratorPool:
+    """Runs `num_workers` processes (defaults to the CPU count) that generate boards
+    for every grid size and difficulty tier in `board_qs`, a dict of grid size to a
+    dict of tier (see difficulty.TIERS) to the queue that tier's boards are pushed
+    into as (bank index, record) pairs, where the record is the board encoded with
+    bank.encode_puzzle. Workers go after whichever queue is emptiest, so tiers that
+    are hard to come by still fill up (see steering.py). More workers can be added
+    with add_worker, up to `max_workers` (defaults to `num_workers`). Each worker
+    stops once it reads a message from `kill_q`. Passing a `seed` makes every
+    worker's random stream reproducible, and passing a `bank_dir` makes every worker
+    append its boards to the bank for their size in that directory before queueing
+    them (otherwise the bank index is None). Passing `collect_metrics` turns on the
+    workers' counters (see metrics.py) from the start, and set_metrics switches them
+    at any time"""
+
+    def __init__(
+        self,
+        board_qs,
+        kill_q,
+        num_workers=None,
+        seed=None,
+        verbose=True,
+        bank_dir=None,
+        max_workers=None,
+        collect_metrics=False,
+    ):
+        self.board_qs = board_qs
+        self.kill_q = kill_q
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_workers = max(max_workers or self.num_workers, self.num_workers)
+        self.seed = seed
+        self.verbose = verbose
+        self.bank_dir = bank_dir
+        self.workers = []
+
+        self._metrics_on = Event()
+        if collect_metrics:
+            self._metrics_on.set()
+
+        # one request event per worker, and the latest counters each has sent back
+        self._metrics_requests = []
+        self._metrics_q = Queue()
+        self._worker_metrics = {}
+
+    def _start_worker(self):
+        metrics_request = Event()
+        worker = Process(
+            target=_generate_boards_in_background,
+            args=(
+                self.board_qs,
+                self.kill_q,
+                len(self.workers),
+                self.seed,
+                self.verbose,
+                self.bank_dir,
+                self._metrics_on,
+                metrics_request,
+                self._metrics_q,
+            ),
+            daemon=True,
+        )
+        worker.start()
+        self.workers.append(worker)
+        self._metrics_requests.append(metrics_request)
+
+    def start(self):
+        for _ in range(self.num_workers):
+            self._start_worker()
+
+    def add_worker(self):
+        """Starts another worker unless there are already `max_workers`. Returns
+        whether one was started"""
+        if len(self.workers) >= self.max_workers:
+            return False
+
+        self._start_worker()
+        return True
+
+    def set_metrics(self, on=True):
+        """Switches the workers' counters on or off"""
+        if on:
+            self._metrics_on.set()
+        else:
+            self._metrics_on.clear()
+
+    def get_metrics(self, timeout=1):
+        """Returns the counters of every worker added up (see metrics.merge). Workers
+        answer between rounds of generation, so a worker that doesn't answer within
+        `timeout` seconds is counted as of the last time it did"""
+        for request in self._metrics_requests:
+            request.set()
+
+        waiting = {
+            worker_id
+            for worker_id, worker in enumerate(self.workers)
+            if worker.is_alive()
+        }
+        deadline = time.time() + timeout
+        while waiting:
+            try:
+                worker_id, snapshot = self._metrics_q.get(
+                    timeout=max(deadline - time.time(), 0)
+                )
+            except Empty:
+                break
+
+            self._worker_metrics[worker_id] = snapshot
+            waiting.discard(worker_id)
+
+        return metrics.merge(self._worker_metrics.values())
+
+    def stop(self, timeout=2):
+        # one kill message per worker, since each worker consumes the one it reads
+        for _ in self.workers:
+            self.kill_q.put(True)
+
+        # workers in the middle of generating a board won't see the message until
+        # they're done, so don't wait on them forever
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            worker.join(max(deadline - time.time(), 0))
+            if worker.is_alive():
+                worker.terminate()
+
+        self.workers = []
+        self._metrics_requests = []
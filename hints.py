@@ -0,0 +1,248 @@
+# live bookkeeping of what the player's queens and X's rule out
+#
+# a HintEngine hooks into a board and keeps, for every tile, how many of the player's
+# queens attack it, and for every row, column and region, how many of its tiles could
+# still take a queen (the board already counts the queens in each). a click only
+# touches the tiles the changed tile attacks, so conflicts and forced tiles are always
+# up to date without scanning the board, and a hint only has to look at the board
+# when no forced tile is left to point at
+
+from difficulty import find_step
+from tile import TileState
+
+
+class Hint:
+    """What a hint points at. `kind` is one of
+      conflict: queens that attack each other
+      mistake: a queen or X that doesn't match the solution
+      queen: a tile that has to hold a queen
+      exclude: tiles that can't hold a queen
+    `tiles` are the (row, column) positions and `rule` is the difficulty.RULES
+    deduction behind it, if there is one"""
+
+    __slots__ = ("kind", "tiles", "rule")
+
+    def __init__(self, kind, tiles, rule=None):
+        self.kind = kind
+        self.tiles = tiles
+        self.rule = rule
+
+    def __repr__(self):
+        return f"Hint({self.kind!r}, {self.tiles!r}, {self.rule!r})"
+
+
+class HintEngine:
+    """Tracks `board` as the player changes it. Create it once every tile is set, and
+    it keeps itself up to date through Tile.state from then on"""
+
+    def __init__(self, board):
+        size = board.size
+        self.board = board
+        self.size = size
+        self.tiles = [board.get_tile(divmod(cell, size)) for cell in range(size**2)]
+        self.regions = [tile.color.value - 1 for tile in self.tiles]
+
+        # units are the rows, then the columns, then the regions
+        self.cell_units = [
+            (cell // size, size + cell % size, 2 * size + self.regions[cell])
+            for cell in range(size**2)
+        ]
+        self.unit_cells = [[] for _ in range(3 * size)]
+        for cell, units in enumerate(self.cell_units):
+            for unit in units:
+                self.unit_cells[unit].append(cell)
+
+        # the tiles a queen on each tile rules out: its row, column and region, and
+        # the tiles touching it
+        self.attacks = []
+        for cell in range(size**2):
+            i, j = divmod(cell, size)
+            attacked = set()
+            for unit in self.cell_units[cell]:
+                attacked.update(self.unit_cells[unit])
+            for ni in range(max(i - 1, 0), min(i + 2, size)):
+                for nj in range(max(j - 1, 0), min(j + 2, size)):
+                    attacked.add(ni * size + nj)
+
+            attacked.discard(cell)
+            self.attacks.append(tuple(sorted(attacked)))
+
+        self.states = [TileState.EMPTY for _ in range(size**2)]
+        # number of queens attacking each tile, and of each unit's tiles that could
+        # take a queen
+        self.attacked = [0 for _ in range(size**2)]
+        self.unit_open = [len(cells) for cells in self.unit_cells]
+
+        # units without a queen that have one tile left (forced) or none (dead),
+        # queens attacked by another queen, and tiles that don't match the solution
+        self.forced_units = set()
+        self.dead_units = set()
+        self.conflicts = set()
+        self.mistakes = set()
+
+        board.hints = self
+        for cell, tile in enumerate(self.tiles):
+            self.set_state(tile, tile.state)
+
+        # the board counted its queens before we did, so check every unit once all
+        # of them are in
+        for unit in range(3 * size):
+            self._check_unit(unit)
+
+    def _is_open(self, cell):
+        return (
+            self.attacked[cell] == 0
+            and self.states[cell] != TileState.QUEEN
+            and self.states[cell] != TileState.MARKED
+        )
+
+    def _unit_queens(self, unit):
+        # the board's running counts, which Tile.state updates before calling us
+        if unit < self.size:
+            return self.board.row_queen_count[unit]
+        if unit < 2 * self.size:
+            return self.board.col_queen_count[unit - self.size]
+        return self.board.color_queen_count[unit - 2 * self.size]
+
+    def _check_unit(self, unit):
+        forced = dead = False
+        if self._unit_queens(unit) == 0:
+            forced = self.unit_open[unit] == 1
+            dead = self.unit_open[unit] == 0
+
+        if forced:
+            self.forced_units.add(unit)
+        else:
+            self.forced_units.discard(unit)
+
+        if dead:
+            self.dead_units.add(unit)
+        else:
+            self.dead_units.discard(unit)
+
+    def _update_open(self, cell, was_open):
+        is_open = self._is_open(cell)
+        if is_open == was_open:
+            return
+
+        delta = 1 if is_open else -1
+        for unit in self.cell_units[cell]:
+            self.unit_open[unit] += delta
+            self._check_unit(unit)
+
+    def _add_queen(self, cell):
+        for unit in self.cell_units[cell]:
+            self._check_unit(unit)
+
+        for other in self.attacks[cell]:
+            was_open = self._is_open(other)
+            self.attacked[other] += 1
+            if self.states[other] == TileState.QUEEN:
+                self.conflicts.add(other)
+            self._update_open(other, was_open)
+
+    def _remove_queen(self, cell):
+        for unit in self.cell_units[cell]:
+            self._check_unit(unit)
+
+        for other in self.attacks[cell]:
+            was_open = self._is_open(other)
+            self.attacked[other] -= 1
+            if self.attacked[other] == 0:
+                self.conflicts.discard(other)
+            self._update_open(other, was_open)
+
+    def set_state(self, tile, state):
+        """Called by Tile.state whenever the player changes a tile, once the board
+        has counted the change. Takes time in proportion to the number of tiles a
+        queen on it attacks"""
+        cell = tile.x * self.size + tile.y
+        old_state = self.states[cell]
+        if state == old_state:
+            return
+
+        was_open = self._is_open(cell)
+        if old_state == TileState.QUEEN:
+            self._remove_queen(cell)
+            self.conflicts.discard(cell)
+
+        self.states[cell] = state
+        if state == TileState.QUEEN:
+            self._add_queen(cell)
+            if self.attacked[cell]:
+                self.conflicts.add(cell)
+
+        self._update_open(cell, was_open)
+
+        if (state == TileState.QUEEN and not tile.is_queen) or (
+            state == TileState.MARKED and tile.is_queen
+        ):
+            self.mistakes.add(cell)
+        else:
+            self.mistakes.discard(cell)
+
+    def _posn(self, cell):
+        return divmod(cell, self.size)
+
+    def is_open(self, posn):
+        """Whether the tile could still take a queen, given the queens and X's"""
+        return self._is_open(posn[0] * self.size + posn[1])
+
+    def is_conflict(self, posn):
+        """Whether the tile is a queen attacked by another queen, or is in a row,
+        column or region that has no queen and nowhere left to put one"""
+        cell = posn[0] * self.size + posn[1]
+        return cell in self.conflicts or any(
+            unit in self.dead_units for unit in self.cell_units[cell]
+        )
+
+    def forced_tiles(self):
+        """Tiles that are the last place a queen can go in their row, column or
+        region"""
+        tiles = set()
+        for unit in self.forced_units:
+            for cell in self.unit_cells[unit]:
+                if self._is_open(cell):
+                    tiles.add(self._posn(cell))
+
+        return tiles
+
+    def next_hint(self):
+        """Returns a Hint for the player's next move, or None if the board is
+        solved"""
+        if self.conflicts:
+            return Hint(
+                "conflict", [self._posn(cell) for cell in sorted(self.conflicts)]
+            )
+
+        if self.mistakes:
+            return Hint("mistake", [self._posn(min(self.mistakes))])
+
+        if self.forced_units:
+            return Hint("queen", sorted(self.forced_tiles())[:1], "last_cell")
+
+        cand = queens = 0
+        for cell in range(self.size**2):
+            if self._is_open(cell):
+                cand |= 1 << cell
+            elif self.states[cell] == TileState.QUEEN:
+                queens |= 1 << cell
+
+        if bin(queens).count("1") == self.size:
+            return None
+
+        step = find_step(self.regions, self.size, cand, queens)
+        if step is not None:
+            rule, placed, ruled_out = step
+            kind = "queen" if placed else "exclude"
+            cells = [
+                cell for cell in range(self.size**2) if (placed | ruled_out) >> cell & 1
+            ]
+            return Hint(kind, [self._posn(cell) for cell in cells], rule)
+
+        # the rules are stuck, so give away a queen
+        for cell, tile in enumerate(self.tiles):
+            if tile.is_queen and self.states[cell] != TileState.QUEEN:
+                return Hint("queen", [self._posn(cell)])
+
+        return None
@@ -0,0 +1,116 @@
+# on-disk index of every valid queen layout (one queen per row and column, no two
+# touching) for a grid size
+#
+# an index file is an 8 byte header (magic, version, grid size) followed by every
+# layout in lexicographic order, each stored as `size` bytes where byte i is the
+# column of the queen in row i. the file is built the first time it's needed and
+# memory-mapped after that, so loading it is O(1)
+
+import mmap
+import os
+import random
+import struct
+
+MAGIC = b"QNLY"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxx")
+
+# the index grows by ~10x per size (8: 42KB, 10: 4.8MB, 12: 765MB), so bigger boards
+# sample their layouts with generate_queens.random_layout instead
+LAYOUT_INDEX_MAX_SIZE = 10
+
+# indices loaded by this process
+_layout_indices = {}
+
+
+def get_layout_index_path(index_dir, size):
+    return os.path.join(index_dir, f"layouts_{size}.bin")
+
+
+def enumerate_layouts(size):
+    """Yields every valid layout as bytes, in lexicographic order"""
+    cols = bytearray(size)
+
+    def place(row, used_cols, blocked_cols):
+        if row == size:
+            yield bytes(cols)
+            return
+
+        for j in range(size):
+            col_bit = 1 << j
+            if (used_cols | blocked_cols) & col_bit:
+                continue
+
+            cols[row] = j
+            yield from place(
+                row + 1, used_cols | col_bit, col_bit | (col_bit << 1) | (col_bit >> 1)
+            )
+
+    yield from place(0, 0, 0)
+
+
+def build_layout_index(path, size):
+    # write to a temporary file first, so other processes never see half an index
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size))
+        for layout in enumerate_layouts(size):
+            f.write(layout)
+
+    os.replace(tmp_path, path)
+
+
+class LayoutIndex:
+    """Every valid layout for one grid size, read through a memory map"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+        if not os.path.exists(path):
+            build_layout_index(path, size)
+
+        with open(path, "rb") as f:
+            magic, version, file_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or file_size != size:
+                raise ValueError(
+                    f"{path} is not a version {VERSION} index of {size}x{size} layouts"
+                )
+
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return (len(self._mmap) - HEADER.size) // self.size
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError(f"Layout index {index} out of range")
+
+        offset = HEADER.size + index * self.size
+        return list(self._mmap[offset : offset + self.size])
+
+    def sample(self, rng=random):
+        """Returns a layout chosen uniformly at random"""
+        return self[rng.randrange(len(self))]
+
+    @property
+    def buffer(self):
+        """The raw layout bytes, `size` per layout, e.g. for numpy.frombuffer"""
+        return memoryview(self._mmap)[HEADER.size :]
+
+
+def get_layout_index(size, index_dir=".queens"):
+    """Returns the layout index for `size`, building it in `index_dir` if it doesn't
+    exist yet"""
+    if size > LAYOUT_INDEX_MAX_SIZE:
+        raise ValueError(
+            f"Layouts aren't indexed above {LAYOUT_INDEX_MAX_SIZE}x{LAYOUT_INDEX_MAX_SIZE}"
+        )
+
+    if size not in _layout_indices:
+        os.makedirs(index_dir, exist_ok=True)
+        _layout_indices[size] = LayoutIndex(
+            get_layout_index_path(index_dir, size), size
+        )
+
+    return _layout_indices[size]
@@ -0,0 +1,72 @@
+# counters and stage timers for board generation
+#
+# everything is off by default and only costs a flag check while off. turn it on with
+# enable() (or by setting QUEENS_METRICS=1) and read it back with snapshot(). worker
+# processes have their own counters, which generator.GeneratorPool.get_metrics
+# collects
+
+import os
+import time
+from contextlib import nullcontext
+
+_enabled = os.environ.get("QUEENS_METRICS", "") not in ("", "0")
+
+# name to count, and name to total seconds
+counters = {}
+timers = {}
+
+_NO_TIMER = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timers[self.name] = timers.get(self.name, 0) + time.perf_counter() - self.t0
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def count(name, n=1):
+    if _enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def timed(name):
+    """Context manager that adds the time spent inside it to timers[name]"""
+    return _Timer(name) if _enabled else _NO_TIMER
+
+
+def reset():
+    counters.clear()
+    timers.clear()
+
+
+def snapshot():
+    """Returns a copy of the counters and timers, safe to pickle or dump as JSON"""
+    return {"counters": dict(counters), "timers": dict(timers)}
+
+
+def merge(snapshots):
+    """Adds up several snapshots, e.g. one from each worker"""
+    merged = {"counters": {}, "timers": {}}
+    for snap in snapshots:
+        for kind in ("counters", "timers"):
+            for name, value in snap[kind].items():
+                merged[kind][name] = merged[kind].get(name, 0) + value
+
+    return merged
@@ -0,0 +1,155 @@
+# lightweight board representation for generating and solving boards
+#
+# a Puzzle is just the region id of every tile (row-major, one byte each) and the
+# column of the queen in each row. generation, solving, the bank and the worker queues
+# all use puzzles, and the Board and Tile objects the UI needs are only built with
+# Board.from_puzzle once a board is about to be played
+
+from constants import GRID_SIZE
+from coloring import color_layout
+from repair import repair_coloring
+from generate_queens import generate_random_board_posns
+from solver import count_solutions
+from batch_solver import count_solutions_batch
+from steering import scale_min_sizes
+import metrics
+
+import random
+
+# number of colorings tried for each queen layout before moving on to a new one
+COLORINGS_PER_LAYOUT = 32
+
+# the numpy checker only beats the search solver while there are few layouts to test
+# (see benchmark.py), so bigger boards are checked one at a time
+BATCH_CHECK_MAX_SIZE = 8
+
+
+class Puzzle:
+    __slots__ = ("size", "regions", "solution")
+
+    def __init__(self, size, regions, solution):
+        self.size = size
+        self.regions = bytes(regions)
+        self.solution = bytes(solution)
+
+    def __repr__(self):
+        return f"Puzzle({self.size}, {self.regions!r}, {self.solution!r})"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Puzzle)
+            and self.size == other.size
+            and self.regions == other.regions
+            and self.solution == other.solution
+        )
+
+    def __hash__(self):
+        return hash((self.size, self.regions, self.solution))
+
+    @property
+    def queen_posns(self):
+        return [(i, j) for i, j in enumerate(self.solution)]
+
+    def count_solutions(self, limit=2):
+        return count_solutions(self.regions, self.size, limit)
+
+    def to_dict(self):
+        """Same format as Board.to_dict, without building the tiles"""
+        return [
+            {
+                "x": i,
+                "y": j,
+                "color": self.regions[i * self.size + j] + 1,
+                "is_queen": self.solution[i] == j,
+                "state": 0,
+            }
+            for i in range(self.size)
+            for j in range(self.size)
+        ]
+
+
+def count_solutions_each(regions_batch, size=GRID_SIZE):
+    """Returns the number of solutions of each coloring in `regions_batch`, checking
+    them all at once for grid sizes up to BATCH_CHECK_MAX_SIZE. Counts are only exact
+    up to 2 for bigger sizes"""
+    if not regions_batch:
+        return []
+
+    if size <= BATCH_CHECK_MAX_SIZE:
+        return count_solutions_batch(regions_batch, size).tolist()
+
+    return [count_solutions(regions, size) for regions in regions_batch]
+
+
+def generate_random_puzzles(
+    size=GRID_SIZE,
+    num_colorings=COLORINGS_PER_LAYOUT,
+    rng=random,
+    max_rounds=None,
+    min_sizes=None,
+):
+    """Returns a list of puzzles with a unique solution. Each round colors the same
+    queen layout `num_colorings` times, checks the colorings together and keeps every
+    distinct one with a unique solution. Colorings with several solutions go through
+    repair_coloring, which saves most of them. Rounds repeat until a puzzle is found,
+    or until `max_rounds` rounds are done (so the list can be empty). `min_sizes` is
+    passed on to coloring.color_layout. All randomness comes from `rng`, so the same
+    seed always gives the same puzzles"""
+    rounds = 0
+    while max_rounds is None or rounds < max_rounds:
+        rounds += 1
+
+        with metrics.timed("generate.layout"):
+            solution = [j for _, j in generate_random_board_posns(size, rng)]
+        metrics.count("generate.layouts")
+
+        # a dict rather than a set, so the order doesn't depend on hash randomization
+        with metrics.timed("generate.coloring"):
+            candidates = {}
+            for _ in range(num_colorings):
+                regions = color_layout(solution, size, rng, min_sizes)
+                if regions is not None:
+                    candidates[bytes(regions)] = None
+
+        with metrics.timed("generate.solving"):
+            candidates = list(candidates)
+            sols = count_solutions_each(candidates, size)
+            unique = {
+                regions: None
+                for regions, num_sols in zip(candidates, sols)
+                if num_sols == 1
+            }
+
+        metrics.count("generate.solver_calls", len(candidates))
+        metrics.count(
+            "generate.rejected.multiple_solutions", len(candidates) - len(unique)
+        )
+
+        # most colorings with several solutions are a few cells away from having one
+        with metrics.timed("generate.repair"):
+            for regions, num_sols in zip(candidates, sols):
+                if num_sols > 1:
+                    repaired = repair_coloring(regions, solution, size, rng, min_sizes)
+                    if repaired is not None:
+                        unique[bytes(repaired)] = None
+
+        puzzles = [Puzzle(size, regions, solution) for regions in unique]
+        metrics.count("generate.puzzles", len(puzzles))
+
+        if puzzles:
+            return puzzles
+
+    return []
+
+
+def generate_puzzle(size=GRID_SIZE, seed=0, index=0, scale=1):
+    """Returns the puzzle identified by `size`, `seed`, its `index` in the batch the
+    seed gives and the `scale` of its big region (see steering.scale_min_sizes), or
+    None if the batch has no puzzle at `index`. The same inputs always give the same
+    puzzle (as long as the generation code doesn't change), so they can be stored or
+    shared in place of the board. Every board the workers make is banked with its
+    inputs (see bank.encode_puzzle)"""
+    puzzles = generate_random_puzzles(
+        size, rng=random.Random(seed), min_sizes=scale_min_sizes(size, scale)
+    )
+    return puzzles[index] if index < len(puzzles) else None
@@ -1,249 +1,162 @@
 from constants import *
 from board import Board
-from utils import grid_to_screen, screen_to_grid
-from colors import COLOR_TO_TUPLE
+from utils import screen_to_grid
 from tile import TileState
 from button import Button
+from generator import GeneratorPool
+from bank import PuzzleBank, get_bank_path
+from supply import BoardSupply
+from sprites import QueenSprites
+from renderer import Renderer
+from difficulty import TIERS
+from hints import HintEngine
 import argparse
 import os
 import json
-from multiprocessing import Queue, Process
+from multiprocessing import Queue
 
 import pygame
 import pygame.freetype
 import time
 
 
-def draw_board_background(screen):
-    # Fill the background with white
-    screen.fill((255, 255, 255))
-
-    # draw vertical lines
-    pygame.draw.rect(
-        screen, (0, 0, 0), pygame.Rect(0, 0, LINE_THICKNESS // 2, GRID_PIXEL_HEIGHT)
-    )
-    pygame.draw.rect(
-        screen,
-        (0, 0, 0),
-        pygame.Rect(
-            GRID_PIXEL_WIDTH - (LINE_THICKNESS // 2),
-            0,
-            LINE_THICKNESS,
-            GRID_PIXEL_HEIGHT,
-        ),
-    )
-    for x in range(
-        (GRID_PIXEL_WIDTH // 8) - (LINE_THICKNESS // 2),
-        GRID_PIXEL_WIDTH,
-        GRID_PIXEL_WIDTH // 8,
-    ):
-        # print(x)
-        pygame.draw.rect(
-            screen, (0, 0, 0), pygame.Rect(x, 0, LINE_THICKNESS, GRID_PIXEL_HEIGHT)
-        )
-
-    # draw horizontal lines
-    pygame.draw.rect(
-        screen, (0, 0, 0), pygame.Rect(0, 0, GRID_PIXEL_WIDTH, LINE_THICKNESS // 2)
-    )
-    pygame.draw.rect(
-        screen,
-        (0, 0, 0),
-        pygame.Rect(
-            0,
-            GRID_PIXEL_WIDTH - (LINE_THICKNESS // 2),
-            GRID_PIXEL_WIDTH,
-            LINE_THICKNESS,
-        ),
-    )
-    for y in range(
-        (GRID_PIXEL_HEIGHT // 8) - (LINE_THICKNESS // 2),
-        GRID_PIXEL_HEIGHT,
-        GRID_PIXEL_HEIGHT // 8,
-    ):
-        pygame.draw.rect(
-            screen, (0, 0, 0), pygame.Rect(0, y, GRID_PIXEL_WIDTH, LINE_THICKNESS)
-        )
-
-
-def draw_board(screen, font, board, check_mode=False):
-    for i in range(GRID_SIZE):
-        for j in range(GRID_SIZE):
-            tile = board.get_tile((i, j))
-            tile_center = grid_to_screen((i, j))
-
-            # add colors
-            color = tile.color
-            r = pygame.Rect(
-                (0, 0),
-                (
-                    GRID_PIXEL_WIDTH // 8 - LINE_THICKNESS,
-                    GRID_PIXEL_HEIGHT // 8 - LINE_THICKNESS,
-                ),
-            )
-            r.center = tile_center
-            pygame.draw.rect(screen, COLOR_TO_TUPLE[color], r)
-
-            mark_color = (0, 0, 0)
-            if check_mode:
-                # green mark if correct, red otherwise
-                if tile.state == TileState.MARKED and tile.is_queen:
-                    mark_color = (255, 0, 0)
-                else:
-                    mark_color = (0, 255, 0)
-
-            queen_color = None
-            if check_mode:
-                # green queen if correct, red otherwise
-                if tile.state == TileState.QUEEN and not tile.is_queen:
-                    queen_color = (255, 0, 0)
-                else:
-                    queen_color = (0, 255, 0)
-
-            # draw state sprites
-            if tile.state == TileState.MARKED:
-                text_str = "x"
-                text_rect = font.get_rect(text_str)
-                text_rect.center = tile_center
-                font.render_to(screen, text_rect.topleft, text_str, mark_color)
-            elif tile.state == TileState.QUESTION:
-                text_str = "?"
-                text_rect = font.get_rect(text_str)
-                text_rect.center = tile_center
-                font.render_to(screen, text_rect.topleft, text_str, (0, 0, 0))
-            elif tile.state == TileState.QUEEN:
-                scale_factor = 1
-                if board.is_solved():
-                    scale_factor = tile.get_next_scale_factor()
-
-                img = pygame.image.load("assets/my_queen.png").convert_alpha()
-
-                if queen_color:
-                    img.fill(queen_color, special_flags=pygame.BLEND_ADD)
-
-                img = pygame.transform.scale_by(img, 0.10 * scale_factor)
-                img_rect = img.get_rect()
-                img_rect.center = tile_center
-                screen.blit(img, img_rect.topleft)
-                # r = pygame.Rect((0, 0), (30 * scale_factor, 30 * scale_factor))
-                # r.center = tile_center
-                # pygame.draw.rect(screen, queen_color, r)
-
-
-def draw_time(screen, font, elapsed_time):
-    elapsed_minutes = elapsed_time // 60
-    elapsed_seconds = elapsed_time % 60
-
-    if elapsed_minutes < 10:
-        elapsed_minutes = f"0{elapsed_minutes}"
-    else:
-        elapsed_minutes = str(elapsed_minutes)
-
-    if elapsed_seconds < 10:
-        elapsed_seconds = f"0{elapsed_seconds}"
-    else:
-        elapsed_seconds = str(elapsed_seconds)
-
-    text_str = f"{elapsed_minutes}:{elapsed_seconds}"
-    text_rect = font.get_rect(text_str)
-    text_rect.center = (GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), text_rect.height)
-    font.render_to(screen, text_rect.topleft, text_str, (0, 0, 0))
-
-
 def handle_grid_mouse_click(board, screen_posn, button):
+    """Changes the clicked tile. Returns whether the click was on the grid"""
     if board.is_solved():
-        return
+        return False
 
     i, j = screen_posn
 
     if i >= 0 and i < GRID_PIXEL_WIDTH and j >= 0 and j < GRID_PIXEL_HEIGHT:
-        tile_i, tile_j = screen_to_grid(screen_posn)
+        tile_i, tile_j = screen_to_grid(screen_posn, board.size)
         tile = board.get_tile((tile_i, tile_j))
 
         if button == 1:
             if tile.state != TileState.QUESTION:
-                next_state = TileState((tile.state.value + 1) % (len(TileState) - 1))
-
-                other_queens = any(
-                    other_tile.state == TileState.QUEEN
-                    for other_tile in board.color_groups[tile.color]
-                )
-                if next_state == TileState.QUEEN:
-                    if Board._is_valid_queen_posn(board, (tile_i, tile_j)):
-                        tile.state = next_state
-                    else:
-                        tile.state = TileState.EMPTY
-                else:
-                    tile.state = next_state
+                # queens can go anywhere, and the board's HintEngine highlights
+                # the ones that attack each other
+                tile.state = TileState((tile.state.value + 1) % (len(TileState) - 1))
         elif button == 3:
             if tile.state == TileState.EMPTY:
                 tile.state = TileState.QUESTION
             elif tile.state == TileState.QUESTION:
                 tile.state = TileState.EMPTY
 
+        return True
+
+    return False
+
+
+def _get_board(supply, tier, waiting_since):
+    """Returns a new board of difficulty `tier` from `supply`, or an already played
+    one if the player has been waiting since `waiting_since` for longer than
+    NEW_GAME_REPLAY_DELAY. Returns None if there's nothing to play yet"""
+    puzzle = supply.get(tier)
+    if puzzle is None and time.time() - waiting_since > NEW_GAME_REPLAY_DELAY:
+        puzzle = supply.get_played(tier=tier)
+
+    if puzzle is None:
+        return None
 
-def _generate_boards_in_background(board_q, kill_q):
-    while True:
-        # check if we have been killed :(
-        try:
-            kill_q.get_nowait()
-            print("Dying!")
-            return
-        except:
-            pass
-
-        print("Generating board!")
-        board = Board.generate_random_board()
-        print("Done generating!")
-
-        while True:
-            try:
-                kill_q.get(False)
-                print("Dying!")
-                return
-            except:
-                pass
-
-            try:
-                board_q.put_nowait(board)
-                print("Generated board!")
-                break
-            except:
-                time.sleep(1)
+    board = Board.from_puzzle(puzzle)
+    board.set_up_win_animation()
+    HintEngine(board)
+    return board
 
 
 if __name__ == "__main__":
-    """
-    TODO:
-    - let users choose between a board size of 8, 9, 10 tiles
-    - let choosers choose a higher difficulty
-    """
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes generating boards at startup (defaults to half the "
+        "CPU count)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Number of processes to grow to when boards run low (defaults to the CPU "
+        "count)",
+    )
+    parser.add_argument(
+        "-p",
+        "--prefetch",
+        type=int,
+        default=PREFETCH_DEPTH,
+        help="Number of boards of each size and difficulty to keep ready",
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[GRID_SIZE],
+        choices=GRID_SIZES,
+        help="Grid sizes to generate boards for and let the player choose from",
+    )
+    parser.add_argument(
+        "--difficulty",
+        default=TIERS[0],
+        choices=TIERS,
+        help="Difficulty of the first board",
+    )
     args = parser.parse_args()
 
     # setup a directory for state
     if not os.path.exists(".queens"):
         os.mkdir(".queens")
 
-    # grabbed cached boards
-    cached_boards = []
+    # boards cached by older versions are moved into the bank
     if os.path.exists(".queens/cache.json"):
+        cache_bank = PuzzleBank(get_bank_path(".queens", GRID_SIZE))
         with open(".queens/cache.json") as f:
-            cached_boards = json.load(f)
-
-    print(f"Read {len(cached_boards)}")
+            for board in json.load(f):
+                cache_bank.append(Board.from_dict(board).to_puzzle())
 
-    board_queue = Queue(5)
-    for board in cached_boards[:5]:
-        board_queue.put(Board.from_dict(board))
+        cache_bank.close()
+        os.remove(".queens/cache.json")
 
-    # spawn a worker process to get boards in the background
+    # grab cached boards, one bank per size. boards left over from earlier sessions
+    # are played first. every board generated from now on is also appended to the
+    # bank, but reaches us through the queue for its size and difficulty
+    banks = {}
+    board_queues = {}
+    for size in args.sizes:
+        banks[size] = PuzzleBank(get_bank_path(".queens", size), size)
+        board_queues[size] = {tier: Queue(args.prefetch) for tier in TIERS}
+        print(f"Read {len(banks[size]) - len(banks[size].used)} {size}x{size}")
+
+    # spawn worker processes to get boards in the background, and more of them if
+    # boards are taken faster than they're made
+    cpu_count = os.cpu_count() or 1
     kill_q = Queue()
-    board_generator = Process(
-        target=_generate_boards_in_background, args=(board_queue, kill_q), daemon=True
+    board_generators = GeneratorPool(
+        board_queues,
+        kill_q,
+        args.workers or max(cpu_count // 2, 1),
+        bank_dir=".queens",
+        max_workers=args.max_workers or cpu_count,
+        collect_metrics=args.debug,
     )
-    board_generator.start()
+
+    # the supplies top up the queues from the bank before the workers look at them
+    supplies = {
+        size: BoardSupply(
+            banks[size],
+            board_queues[size],
+            low_watermark=args.prefetch // 2,
+            on_low=board_generators.add_worker,
+        )
+        for size in args.sizes
+    }
+    board_generators.start()
+
+    board_size = args.sizes[0]
+    board_tier = args.difficulty
 
     pygame.init()
     pygame.font.init()
@@ -251,34 +164,61 @@ if __name__ == "__main__":
 
     # Set up the drawing window
     screen = pygame.display.set_mode([SCREEN_WIDTH, SCREEN_HEIGHT])
-    board = board_queue.get()
-    board.set_up_win_animation()
+
+    # there's nothing to draw until the first board arrives
+    waiting_since = time.time()
+    board = None
+    running = True
+    while board is None and running:
+        board = _get_board(supplies[board_size], board_tier, waiting_since)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        clock.tick(10)
+
     print("Got board!")
 
+    queen_sprites = QueenSprites(grid_sizes=args.sizes)
+
     large_font = pygame.freetype.SysFont("Comic Sans MS", 60)
     small_font = pygame.freetype.SysFont("Comic Sans MS", 20)
 
+    renderer = Renderer(screen, small_font, large_font, queen_sprites)
+
     # initialize buttons
     new_game_button = Button("New Game", (200, 50), small_font)
-    new_game_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 150))
+    new_game_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 130))
 
     check_board_button = Button("Check Board", (200, 50), small_font)
-    check_board_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 250))
+    check_board_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 200))
 
     give_up_button = Button("Give Up :(", (200, 50), small_font)
-    give_up_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 350))
+    give_up_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 270))
+
+    size_button = Button(f"Size: {board_size}x{board_size}", (200, 50), small_font)
+    size_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 340))
+
+    tier_button = Button(f"Difficulty: {board_tier}", (200, 50), small_font)
+    tier_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 410))
+
+    hint_button = Button("Hint", (200, 50), small_font)
+    hint_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 480))
 
     debug_button = Button("Debug", (200, 50), small_font)
-    debug_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 450))
+    debug_button.set_position((GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), 550))
 
     # state for button logic
     check_until = 0  # time at which to stop showing "check" hints
+    hint = None  # the hint being shown, until the next click on the grid
 
     start_time = time.time()
     elapsed_time = int(time.time() - start_time)
 
+    # time at which the player asked for a new game that isn't ready yet
+    waiting_since = None
+
     # Run until the user asks to quit
-    running = True
     while running:
         if not board.is_solved():
             elapsed_time = int(time.time() - start_time)
@@ -286,39 +226,22 @@ if __name__ == "__main__":
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.WINDOWEXPOSED:
+                # the window contents may have been lost
+                renderer.invalidate()
             elif event.type == pygame.MOUSEBUTTONUP:
-                handle_grid_mouse_click(board, pygame.mouse.get_pos(), event.button)
+                if handle_grid_mouse_click(board, pygame.mouse.get_pos(), event.button):
+                    hint = None
 
                 # handle pressing screen buttons
                 if (
                     new_game_button.is_in_bounds(pygame.mouse.get_pos())
                     and event.button == 1
+                    and waiting_since is None
                 ):
-                    new_game_button.text_str = "Loading..."
-                    new_game_button.draw(screen)
-                    pygame.display.flip()
-
-                    while True:
-                        try:
-                            board = board_queue.get_nowait()
-                            board.set_up_win_animation()
-                            break
-                        except:
-                            pass
-
-                        for event_2 in pygame.event.get():
-                            if event_2.type == pygame.QUIT:
-                                running = False
-                                break
-
-                        if not running:
-                            break
-
-                    new_game_button.text_str = "New Game"
-                    new_game_button.draw(screen)
-                    pygame.display.flip()
-
-                    start_time = time.time()
+                    # keep playing the current board until the next one is ready
+                    waiting_since = time.time()
+                    new_game_button.set_text("Loading...")
 
                 if (
                     check_board_button.is_in_bounds(pygame.mouse.get_pos())
@@ -330,49 +253,86 @@ if __name__ == "__main__":
                     give_up_button.is_in_bounds(pygame.mouse.get_pos())
                     and event.button == 1
                 ):
-                    for i in range(GRID_SIZE):
-                        for j in range(GRID_SIZE):
+                    for i in range(board.size):
+                        for j in range(board.size):
                             if (i, j) in board.queen_posns:
                                 board.get_tile((i, j)).state = TileState.QUEEN
                             else:
                                 board.get_tile((i, j)).state = TileState.EMPTY
 
+                    # the board is solved, so whatever the hint pointed at is gone
+                    hint = None
+
                 if (
-                    debug_button.is_in_bounds(pygame.mouse.get_pos())
+                    hint_button.is_in_bounds(pygame.mouse.get_pos())
                     and event.button == 1
-                    and args.debug
+                    and not board.is_solved()
                 ):
-                    print(board)
+                    hint = board.hints.next_hint()
 
-        # draw everything
-        draw_board_background(screen)
-        draw_board(screen, small_font, board, check_mode=time.time() < check_until)
-        draw_time(screen, large_font, elapsed_time)
+                if (
+                    size_button.is_in_bounds(pygame.mouse.get_pos())
+                    and event.button == 1
+                ):
+                    # the next new game uses the next size
+                    board_size = args.sizes[
+                        (args.sizes.index(board_size) + 1) % len(args.sizes)
+                    ]
+                    size_button.set_text(f"Size: {board_size}x{board_size}")
 
-        new_game_button.draw(screen)
-        check_board_button.draw(screen)
-        give_up_button.draw(screen)
+                if (
+                    tier_button.is_in_bounds(pygame.mouse.get_pos())
+                    and event.button == 1
+                ):
+                    # the next new game is of the next difficulty
+                    board_tier = TIERS[(TIERS.index(board_tier) + 1) % len(TIERS)]
+                    tier_button.set_text(f"Difficulty: {board_tier}")
 
+                if (
+                    debug_button.is_in_bounds(pygame.mouse.get_pos())
+                    and event.button == 1
+                    and args.debug
+                ):
+                    print(board)
+                    print(json.dumps(board_generators.get_metrics(), indent=2))
+
+        if waiting_since is not None:
+            next_board = _get_board(supplies[board_size], board_tier, waiting_since)
+            if next_board is not None:
+                board = next_board
+                hint = None
+                waiting_since = None
+                new_game_button.set_text("New Game")
+                start_time = time.time()
+                elapsed_time = 0
+
+        # draw whatever changed
+        buttons = [
+            new_game_button,
+            check_board_button,
+            give_up_button,
+            size_button,
+            tier_button,
+            hint_button,
+        ]
         if args.debug:
-            debug_button.draw(screen)
-
-        pygame.display.flip()
+            buttons.append(debug_button)
+
+        renderer.draw(
+            board,
+            elapsed_time,
+            buttons,
+            check_mode=time.time() < check_until,
+            hint=hint,
+        )
         clock.tick(60)
 
-    # stop worker process
-    kill_q.put(True)
-    board_generator.terminate()
-
-    # save any remaining boards into a cache
-    if os.path.exists(".queens/cache.json"):
-        os.remove(".queens/cache.json")
-
-    baords_to_cache = []
-    while not board_queue.empty():
-        baords_to_cache.append(board_queue.get().to_dict())
+    # stop worker processes
+    board_generators.stop()
 
-    with open(".queens/cache.json", "w") as f:
-        json.dump(baords_to_cache, f)
+    # boards still in the queues are already in the banks, so there's nothing to save
+    for bank in banks.values():
+        bank.close()
 
     # Done! Time to quit.
     pygame.quit()
@@ -0,0 +1,247 @@
+from constants import *
+from utils import grid_to_screen
+from colors import COLOR_TO_TUPLE
+from tile import TileState
+from sprites import SCALE_STEPS
+
+import pygame
+import pygame.freetype
+
+
+def draw_board_background(screen, grid_size=GRID_SIZE):
+    # Fill the background with white
+    screen.fill((255, 255, 255))
+
+    # the grid covers as many whole pixels as fit evenly
+    tile_screen_width = GRID_PIXEL_WIDTH // grid_size
+    tile_screen_height = GRID_PIXEL_HEIGHT // grid_size
+    grid_width = tile_screen_width * grid_size
+    grid_height = tile_screen_height * grid_size
+
+    # draw vertical lines (the outer ones are half off the grid)
+    for k in range(grid_size + 1):
+        x = k * tile_screen_width - (LINE_THICKNESS // 2)
+        pygame.draw.rect(
+            screen, (0, 0, 0), pygame.Rect(x, 0, LINE_THICKNESS, grid_height)
+        )
+
+    # draw horizontal lines
+    for k in range(grid_size + 1):
+        y = k * tile_screen_height - (LINE_THICKNESS // 2)
+        pygame.draw.rect(
+            screen, (0, 0, 0), pygame.Rect(0, y, grid_width, LINE_THICKNESS)
+        )
+
+
+def get_tile_rect(posn, grid_size=GRID_SIZE):
+    """Returns the rect of a tile inside the grid lines"""
+    r = pygame.Rect(
+        (0, 0),
+        (
+            GRID_PIXEL_WIDTH // grid_size - LINE_THICKNESS,
+            GRID_PIXEL_HEIGHT // grid_size - LINE_THICKNESS,
+        ),
+    )
+    r.center = grid_to_screen(posn, grid_size)
+    return r
+
+
+def draw_tile_colors(screen, board):
+    for i in range(board.size):
+        for j in range(board.size):
+            color = board.get_tile((i, j)).color
+            pygame.draw.rect(
+                screen, COLOR_TO_TUPLE[color], get_tile_rect((i, j), board.size)
+            )
+
+
+# outline colors for tiles a hint points at, by hints.Hint kind
+HINT_COLORS = {
+    "conflict": (255, 0, 0),
+    "mistake": (255, 0, 0),
+    "queen": (0, 90, 255),
+    "exclude": (255, 140, 0),
+}
+
+
+def draw_tile(
+    screen,
+    font,
+    sprites,
+    tile,
+    scale_factor=1,
+    check_mode=False,
+    conflict=False,
+    hint_kind=None,
+):
+    grid_size = tile.board.size
+    tile_center = grid_to_screen((tile.x, tile.y), grid_size)
+    tile_rect = get_tile_rect((tile.x, tile.y), grid_size)
+
+    mark_color = (0, 0, 0)
+    if check_mode:
+        # green mark if correct, red otherwise
+        if tile.state == TileState.MARKED and tile.is_queen:
+            mark_color = (255, 0, 0)
+        else:
+            mark_color = (0, 255, 0)
+
+    queen_color = None
+    if check_mode:
+        # green queen if correct, red otherwise
+        if tile.state == TileState.QUEEN and not tile.is_queen:
+            queen_color = (255, 0, 0)
+        else:
+            queen_color = (0, 255, 0)
+    elif conflict:
+        queen_color = (255, 0, 0)
+
+    if conflict:
+        pygame.draw.rect(screen, (255, 0, 0), tile_rect, 2)
+    if hint_kind is not None:
+        pygame.draw.rect(screen, HINT_COLORS[hint_kind], tile_rect, 4)
+
+    # draw state sprites
+    if tile.state == TileState.MARKED:
+        text_str = "x"
+        text_rect = font.get_rect(text_str)
+        text_rect.center = tile_center
+        font.render_to(screen, text_rect.topleft, text_str, mark_color)
+    elif tile.state == TileState.QUESTION:
+        text_str = "?"
+        text_rect = font.get_rect(text_str)
+        text_rect.center = tile_center
+        font.render_to(screen, text_rect.topleft, text_str, (0, 0, 0))
+    elif tile.state == TileState.QUEEN:
+        img = sprites.get(scale_factor, queen_color, grid_size)
+        img_rect = img.get_rect()
+        img_rect.center = tile_center
+        screen.blit(img, img_rect.topleft)
+
+
+def format_time(elapsed_time):
+    elapsed_minutes = elapsed_time // 60
+    elapsed_seconds = elapsed_time % 60
+
+    if elapsed_minutes < 10:
+        elapsed_minutes = f"0{elapsed_minutes}"
+    else:
+        elapsed_minutes = str(elapsed_minutes)
+
+    if elapsed_seconds < 10:
+        elapsed_seconds = f"0{elapsed_seconds}"
+    else:
+        elapsed_seconds = str(elapsed_seconds)
+
+    return f"{elapsed_minutes}:{elapsed_seconds}"
+
+
+def draw_time(screen, font, text_str):
+    """Draws the timer and returns the rect it covers"""
+    text_rect = font.get_rect(text_str)
+    text_rect.center = (GRID_PIXEL_WIDTH + (SIDE_PANEL_WIDTH // 2), text_rect.height)
+    font.render_to(screen, text_rect.topleft, text_str, (0, 0, 0))
+    return text_rect
+
+
+class Renderer:
+    """Draws the game onto `screen`, keeping the grid lines and colored regions of the
+    current board on a cached background surface. Each frame only the tiles, timer
+    and buttons that changed since the last frame are redrawn and pushed to the
+    display"""
+
+    def __init__(self, screen, small_font, large_font, sprites):
+        self.screen = screen
+        self.small_font = small_font
+        self.large_font = large_font
+        self.sprites = sprites
+        self.background = pygame.Surface(screen.get_size())
+
+        self.invalidate()
+
+    def invalidate(self):
+        """Forces the next frame to redraw everything"""
+        self._board = None
+
+    def _reset(self, board):
+        draw_board_background(self.background, board.size)
+        draw_tile_colors(self.background, board)
+        self.screen.blit(self.background, (0, 0))
+
+        # what was last drawn on each tile, the timer and each button
+        self._board = board
+        self._tiles = {}
+        self._time_str = None
+        self._time_rect = None
+        self._buttons = {}
+
+    def draw(self, board, elapsed_time, buttons, check_mode=False, hint=None):
+        """Draws a frame. Conflicts come from the board's hints.HintEngine, if it has
+        one, and the tiles of `hint` (a hints.Hint) are outlined"""
+        dirty_rects = []
+        hint_tiles = set(hint.tiles) if hint is not None else ()
+
+        if board is not self._board:
+            self._reset(board)
+            dirty_rects.append(self.screen.get_rect())
+
+        # queens only animate once the board is solved
+        is_solved = board.is_solved()
+
+        for i in range(board.size):
+            for j in range(board.size):
+                tile = board.get_tile((i, j))
+
+                scale_factor = 1
+                if is_solved and tile.state == TileState.QUEEN:
+                    scale_factor = tile.get_next_scale_factor()
+
+                conflict = board.hints is not None and board.hints.is_conflict((i, j))
+                hint_kind = hint.kind if (i, j) in hint_tiles else None
+
+                key = (
+                    tile.state,
+                    check_mode,
+                    round(scale_factor * SCALE_STEPS),
+                    conflict,
+                    hint_kind,
+                )
+                if self._tiles.get((i, j)) == key:
+                    continue
+
+                self._tiles[(i, j)] = key
+                r = get_tile_rect((i, j), board.size)
+                self.screen.blit(self.background, r, r)
+                draw_tile(
+                    self.screen,
+                    self.small_font,
+                    self.sprites,
+                    tile,
+                    scale_factor,
+                    check_mode,
+                    conflict,
+                    hint_kind,
+                )
+                dirty_rects.append(r)
+
+        time_str = format_time(elapsed_time)
+        if time_str != self._time_str:
+            if self._time_rect:
+                self.screen.blit(self.background, self._time_rect, self._time_rect)
+                dirty_rects.append(self._time_rect)
+
+            self._time_str = time_str
+            self._time_rect = draw_time(self.screen, self.large_font, time_str)
+            dirty_rects.append(self._time_rect)
+
+        for button in buttons:
+            if self._buttons.get(button) == button.text_str:
+                continue
+
+            self._buttons[button] = button.text_str
+            self.screen.blit(self.background, button.button_rect, button.button_rect)
+            button.draw(self.screen)
+            dirty_rects.append(button.button_rect)
+
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
@@ -0,0 +1,112 @@
+# fixing colorings that have more than one solution
+#
+# a second solution puts one queen in every region, just like the intended one. moving
+# one of its queen cells into a neighboring region leaves that neighbor with two of its
+# queens and the old region with none, so it stops being a solution. the intended
+# solution's queens never move, so it stays valid. the move can create a new second
+# solution, so this repeats a few times before giving up
+
+from constants import GRID_SIZE, MIN_COLOR_SIZE_COUNTS
+from coloring import get_neighbors
+from solver import find_solutions
+import metrics
+
+import random
+
+# solver calls spent on one coloring before giving up on it
+MAX_REPAIR_STEPS = 6
+
+
+def _meets_min_sizes(region_sizes, min_sizes):
+    # match the biggest requirements to the biggest regions
+    sizes = sorted(region_sizes, reverse=True)
+    k = 0
+    for min_size, count in sorted(min_sizes.items(), reverse=True):
+        for _ in range(count):
+            if sizes[k] < min_size:
+                return False
+            k += 1
+
+    return True
+
+
+def _stays_connected(regions, size, region, removed):
+    """Whether `region` is still connected without the cell `removed`"""
+    neighbors = get_neighbors(size)
+    cells = [c for c, r in enumerate(regions) if r == region and c != removed]
+
+    seen = {cells[0]}
+    stack = [cells[0]]
+    while stack:
+        cell = stack.pop()
+        for n in neighbors[cell]:
+            if n != removed and regions[n] == region and n not in seen:
+                seen.add(n)
+                stack.append(n)
+
+    return len(seen) == len(cells)
+
+
+def _candidate_moves(regions, solution, other, size):
+    """(cell, new region) pairs that would break the solution `other`"""
+    neighbors = get_neighbors(size)
+    queen_cells = {i * size + j for i, j in enumerate(solution)}
+
+    moves = []
+    for i, j in enumerate(other):
+        cell = i * size + j
+        if cell in queen_cells:
+            continue
+
+        for n in neighbors[cell]:
+            if regions[n] != regions[cell]:
+                moves.append((cell, regions[n]))
+
+    return moves
+
+
+def repair_coloring(regions, solution, size=GRID_SIZE, rng=random, min_sizes=None):
+    """Tries to give the coloring `regions` (region ids in row-major order) a unique
+    solution, `solution` (the column of the queen in each row), by moving cells of
+    the other solutions into neighboring regions. Every region stays connected and
+    `min_sizes` (see coloring.color_layout) stays met. Returns the new region ids, or
+    None if it didn't work out"""
+    if min_sizes is None:
+        min_sizes = MIN_COLOR_SIZE_COUNTS[size]
+
+    regions = list(regions)
+    solution = tuple(solution)
+    region_sizes = [0 for _ in range(size)]
+    for region in regions:
+        region_sizes[region] += 1
+
+    metrics.count("repair.attempts")
+    for _ in range(MAX_REPAIR_STEPS):
+        metrics.count("repair.solver_calls")
+        others = [s for s in find_solutions(regions, size) if s != solution]
+        if not others:
+            metrics.count("repair.succeeded")
+            return regions
+
+        moves = _candidate_moves(regions, solution, others[0], size)
+        rng.shuffle(moves)
+
+        for cell, new_region in moves:
+            old_region = regions[cell]
+
+            region_sizes[old_region] -= 1
+            region_sizes[new_region] += 1
+            if _meets_min_sizes(region_sizes, min_sizes) and _stays_connected(
+                regions, size, old_region, cell
+            ):
+                regions[cell] = new_region
+                break
+
+            region_sizes[old_region] += 1
+            region_sizes[new_region] -= 1
+        else:
+            # nothing can be moved without breaking a region
+            break
+
+    metrics.count("repair.failed")
+    return None
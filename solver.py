@@ -0,0 +1,229 @@
+# bitmask solver for checking whether a colored board has a unique solution
+#
+# a board is described by a flat, row-major list of region ids (0 to size - 1), so
+# the cell at (i, j) has region regions[i * size + j]. rows, columns and regions
+# are tracked as integer bitmasks, so a search step never touches a Tile
+
+# below this size the plain row by row search is cheaper than propagating
+PROPAGATION_MIN_SIZE = 10
+
+
+def _build_rows(regions, size):
+    # for every row, the (column bit, region bit, column) of each of its cells
+    return [
+        [(1 << j, 1 << regions[i * size + j], j) for j in range(size)]
+        for i in range(size)
+    ]
+
+
+def _build_regions_below(rows, size):
+    # regions_below[i] is the set of regions with at least one cell in rows i and up
+    regions_below = [0 for _ in range(size + 1)]
+    for i in range(size - 1, -1, -1):
+        regions_below[i] = regions_below[i + 1]
+        for _, region_bit, _ in rows[i]:
+            regions_below[i] |= region_bit
+
+    return regions_below
+
+
+def solve(regions, size, limit=2, stats=None):
+    """Returns a list of at most `limit` solutions of the board. Each solution is a
+    tuple where the i-th entry is the column of the queen in row i. If `stats` is a
+    dict, the number of search nodes visited is added to stats["nodes"]"""
+    rows = _build_rows(regions, size)
+    regions_below = _build_regions_below(rows, size)
+    all_regions = (1 << size) - 1
+
+    solutions = []
+    queen_cols = [0 for _ in range(size)]
+
+    def search(row, used_cols, used_regions, blocked_cols):
+        if stats is not None:
+            stats["nodes"] = stats.get("nodes", 0) + 1
+
+        # every region we haven't used yet needs a cell somewhere below us
+        if all_regions & ~used_regions & ~regions_below[row]:
+            return False
+
+        for col_bit, region_bit, j in rows[row]:
+            if (used_cols | blocked_cols) & col_bit or used_regions & region_bit:
+                continue
+
+            queen_cols[row] = j
+            if row == size - 1:
+                solutions.append(tuple(queen_cols))
+                if len(solutions) >= limit:
+                    return True
+            elif search(
+                row + 1,
+                used_cols | col_bit,
+                used_regions | region_bit,
+                # queens can't touch, so the next row can't use this column or its neighbors
+                col_bit | (col_bit << 1) | (col_bit >> 1),
+            ):
+                return True
+
+        return False
+
+    search(0, 0, 0, 0)
+    return solutions
+
+
+# cell masks that only depend on the grid size, shared by every board of that size
+_geometries = {}
+
+
+def _get_geometry(size):
+    """Returns (row masks, column masks, masks of each cell's row, column and the 8
+    tiles around it). Cell (i, j) is bit i * size + j"""
+    if size not in _geometries:
+        row_masks = [((1 << size) - 1) << (i * size) for i in range(size)]
+        col_masks = [sum(1 << (i * size + j) for i in range(size)) for j in range(size)]
+
+        lines_and_neighbors = []
+        for i in range(size):
+            for j in range(size):
+                mask = row_masks[i] | col_masks[j]
+                for di in (-1, 0, 1):
+                    for dj in (-1, 0, 1):
+                        if 0 <= i + di < size and 0 <= j + dj < size:
+                            mask |= 1 << ((i + di) * size + j + dj)
+
+                lines_and_neighbors.append(mask)
+
+        _geometries[size] = (row_masks, col_masks, lines_and_neighbors)
+
+    return _geometries[size]
+
+
+class _Units:
+    """Cell bitmasks of every row, column and region of a board, plus the cells each
+    queen placement rules out"""
+
+    def __init__(self, regions, size):
+        row_masks, col_masks, lines_and_neighbors = _get_geometry(size)
+
+        region_masks = [0 for _ in range(size)]
+        for cell, region in enumerate(regions):
+            region_masks[region] |= 1 << cell
+
+        # every unit, and for each cell the units it belongs to (row, column, region)
+        self.masks = row_masks + col_masks + region_masks
+        self.cell_units = [
+            (cell // size, size + cell % size, 2 * size + region)
+            for cell, region in enumerate(regions)
+        ]
+
+        # a queen rules out its row, column, region and the 8 tiles around it
+        self.attacks = [
+            lines_and_neighbors[cell] | region_masks[region]
+            for cell, region in enumerate(regions)
+        ]
+
+
+def _propagate(units, candidates, queens):
+    """Places every forced queen and removes every excluded cell. Returns the new
+    (candidates, queens, unit to branch on), or None if the board can't be solved"""
+    masks = units.masks
+    cell_units = units.cell_units
+    attacks = units.attacks
+
+    changed = True
+    while changed:
+        changed = False
+        best_unit, best_count = None, None
+
+        for u, mask in enumerate(masks):
+            if mask & queens:
+                continue
+
+            available = mask & candidates
+            if not available:
+                return None
+
+            low = available & -available
+            if available == low:
+                # only one cell left in this unit, so it has to be a queen
+                queens |= low
+                candidates &= ~attacks[low.bit_length() - 1]
+                changed = True
+                continue
+
+            # if every cell left in this unit shares some other unit (e.g. a region
+            # confined to one row), that other unit's queen must be in this unit
+            for other in cell_units[low.bit_length() - 1]:
+                other_mask = masks[other]
+                if other != u and available & other_mask == available:
+                    excluded = candidates & other_mask & ~mask
+                    if excluded:
+                        candidates &= ~excluded
+                        changed = True
+
+            count = available.bit_count()
+            if best_count is None or count < best_count:
+                best_unit, best_count = u, count
+
+    return candidates, queens, best_unit
+
+
+def solve_propagating(regions, size, limit=2, stats=None):
+    """Same as solve, but propagates forced placements and always branches on the
+    row, column or region with the fewest cells left"""
+    units = _Units(regions, size)
+    solutions = []
+
+    def search(candidates, queens):
+        if stats is not None:
+            stats["nodes"] = stats.get("nodes", 0) + 1
+
+        result = _propagate(units, candidates, queens)
+        if result is None:
+            return False
+
+        candidates, queens, unit = result
+        if unit is None:
+            # every unit has its queen
+            solutions.append(_queens_to_cols(queens, size))
+            return len(solutions) >= limit
+
+        available = units.masks[unit] & candidates
+        while available:
+            low = available & -available
+            available ^= low
+
+            if search(candidates & ~units.attacks[low.bit_length() - 1], queens | low):
+                return True
+
+            # later branches of this unit don't use this cell
+            candidates &= ~low
+
+        return False
+
+    search((1 << (size * size)) - 1, 0)
+    return solutions
+
+
+def _queens_to_cols(queens, size):
+    cols = [0 for _ in range(size)]
+    while queens:
+        low = queens & -queens
+        queens ^= low
+        i, j = divmod(low.bit_length() - 1, size)
+        cols[i] = j
+
+    return tuple(cols)
+
+
+def find_solutions(regions, size, limit=2, stats=None):
+    """Returns at most `limit` solutions of the board, using whichever solver is
+    faster for its size"""
+    if size >= PROPAGATION_MIN_SIZE:
+        return solve_propagating(regions, size, limit, stats)
+
+    return solve(regions, size, limit, stats)
+
+
+def count_solutions(regions, size, limit=2, stats=None):
+    """Returns the number of solutions of the board, stopping early at `limit`"""
+    return len(find_solutions(regions, size, limit, stats))
@@ -0,0 +1,58 @@
+from constants import GRID_SIZE
+
+import pygame
+
+QUEEN_IMAGE_PATH = "assets/my_queen.png"
+# scale of the image on a GRID_SIZE board, it shrinks as the tiles get smaller
+QUEEN_SCALE = 0.10
+
+# scale factors are rounded to a multiple of 1 / SCALE_STEPS so the win animation
+# reuses a small set of pre-scaled images
+SCALE_STEPS = 50
+
+
+class QueenSprites:
+    """Decodes the queen image once and caches tinted and scaled copies of it. Must be
+    created after the display is set up"""
+
+    def __init__(
+        self,
+        tints=((0, 255, 0), (255, 0, 0)),
+        animation_range=(0.4, 1.0),
+        grid_sizes=(GRID_SIZE,),
+    ):
+        self.image = pygame.image.load(QUEEN_IMAGE_PATH).convert_alpha()
+        self._tinted = {None: self.image}
+        self._scaled = {}
+
+        for tint in tints:
+            self._get_tinted(tint)
+
+        # pre-scale everything the win animation can ask for
+        low, high = animation_range
+        for step in range(round(low * SCALE_STEPS), round(high * SCALE_STEPS) + 1):
+            for tint in self._tinted:
+                for grid_size in grid_sizes:
+                    self.get(step / SCALE_STEPS, tint, grid_size)
+
+    def _get_tinted(self, tint):
+        if tint not in self._tinted:
+            img = self.image.copy()
+            img.fill(tint, special_flags=pygame.BLEND_ADD)
+            self._tinted[tint] = img
+
+        return self._tinted[tint]
+
+    def get(self, scale_factor=1, tint=None, grid_size=GRID_SIZE):
+        """Returns the queen image scaled by `scale_factor` and tinted with the `tint`
+        color (or not tinted if it's None), sized for a board of `grid_size`"""
+        step = round(scale_factor * SCALE_STEPS)
+        key = (step, tint, grid_size)
+
+        if key not in self._scaled:
+            self._scaled[key] = pygame.transform.scale_by(
+                self._get_tinted(tint),
+                QUEEN_SCALE * GRID_SIZE / grid_size * step / SCALE_STEPS,
+            )
+
+        return self._scaled[key]
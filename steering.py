@@ -0,0 +1,53 @@
+# steering generation toward the difficulty tiers that are running low
+#
+# the size of the one big region has the most say in how hard a board comes out. a
+# bigger region makes easier boards, and makes them a lot faster. each worker keeps
+# count of how many boards of each tier every big region size has given it per round
+# (one queen layout), and uses the size that does best for the tier it's after.
+# counting rounds rather than seconds keeps seeded runs reproducible
+
+from constants import MIN_COLOR_SIZE_COUNTS
+
+# big region sizes tried, as a fraction of the one in MIN_COLOR_SIZE_COUNTS
+BIG_REGION_SCALES = (0.8, 1, 1.25)
+
+
+def scale_min_sizes(size, scale):
+    """MIN_COLOR_SIZE_COUNTS for `size`, with the big region's size scaled by
+    `scale`"""
+    min_sizes = {}
+    for min_size, count in MIN_COLOR_SIZE_COUNTS[size].items():
+        if count == 1:
+            min_size = round(min_size * scale)
+        min_sizes[min_size] = min_sizes.get(min_size, 0) + count
+
+    return min_sizes
+
+
+class TierSteering:
+    def __init__(self, scales=BIG_REGION_SCALES):
+        self.scales = scales
+
+        # rounds done with each (size, scale), and boards of each (size, scale, tier)
+        self.rounds = {}
+        self.boards = {}
+
+    def choose_scale(self, size, tier):
+        """The scale expected to give the most boards of `tier` per round. Every
+        scale starts out counted as having given one such board, so a scale that's
+        had little use still gets tried now and then. Ties go to the scale with the
+        fewest rounds, so scales that haven't been used yet are tried in turn"""
+        return max(
+            self.scales,
+            key=lambda scale: (
+                (self.boards.get((size, scale, tier), 0) + 1)
+                / (self.rounds.get((size, scale), 0) + 1),
+                -self.rounds.get((size, scale), 0),
+            ),
+        )
+
+    def record(self, size, scale, tiers):
+        """Records a round done with `scale` that gave boards of `tiers`"""
+        self.rounds[size, scale] = self.rounds.get((size, scale), 0) + 1
+        for tier in tiers:
+            self.boards[size, scale, tier] = self.boards.get((size, scale, tier), 0) + 1
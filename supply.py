@@ -0,0 +1,121 @@
+# hands boards of one grid size to the UI without ever blocking it
+
+from bank import decode_puzzle
+from generator import queue_level
+
+import random
+from queue import Empty
+
+# random picks from the bank to try before giving up on finding a played board of the
+# tier asked for
+PLAYED_TIER_TRIES = 20
+
+
+class BoardSupply:
+    """Supplies unplayed puzzles of each difficulty tier from `bank` and
+    `board_queues` (a dict of tier to the queue a generator.GeneratorPool fills with
+    boards of that tier). Boards left over from earlier sessions come first, then
+    boards from the queue, then boards the workers have banked but not queued yet.
+    When a new board is asked for and the queue for its tier is down to
+    `low_watermark` boards or fewer, `on_low` is called so more boards can be
+    generated. It's called once per board asked for, however many times get is
+    polled before one turns up. Each tier's queue starts out filled with boards from
+    earlier sessions, so workers don't make more of a tier the bank already has
+    plenty of. Create the supply before the workers start"""
+
+    def __init__(self, bank, board_queues, low_watermark=1, on_low=None):
+        self.bank = bank
+        self.board_queues = board_queues
+        self.low_watermark = low_watermark
+        self.on_low = on_low
+
+        # tiers on_low has been called for since a board of the tier was last handed
+        # out
+        self._low_tiers = set()
+
+        # where to pick up looking for boards of each tier from before this session,
+        # and for banked boards of each tier from this session. every board before
+        # them is used or of another tier. the bank is only scanned as far as it takes
+        # to find the next board, so a big bank doesn't slow down startup
+        self._session_start = len(bank)
+        self._backlog_scanned = {tier: 0 for tier in board_queues}
+        self._scanned = {tier: self._session_start for tier in board_queues}
+
+        for tier, board_queue in board_queues.items():
+            while not board_queue.full():
+                index = self._find_banked(
+                    tier, self._backlog_scanned, self._session_start
+                )
+                if index is None:
+                    break
+
+                board_queue.put_nowait((index, bank.get_record(index)))
+
+    def _find_banked(self, tier, scanned, stop):
+        """Returns the index of the first unused board of `tier` from `scanned[tier]`
+        up to `stop`, or None if there isn't one, and moves the cursor past it"""
+        for index in self.bank.tier_indices(tier, stop, scanned[tier]):
+            scanned[tier] = index + 1
+            return index
+
+        scanned[tier] = stop
+        return None
+
+    def _take_new(self, tier):
+        while True:
+            try:
+                index, record = self.board_queues[tier].get_nowait()
+            except Empty:
+                break
+
+            # skip boards we already took straight from the bank
+            if index is None or index not in self.bank.used:
+                return index, decode_puzzle(record, self.bank.size)
+
+        # the queue is dry, but boards of this tier may already be banked, either the
+        # rest of a worker's batch or ones that turned up while it was after another
+        # tier
+        index = self._find_banked(tier, self._scanned, len(self.bank))
+        if index is None:
+            return None, None
+
+        return index, self.bank[index]
+
+    def get(self, tier):
+        """Returns the next unplayed puzzle of difficulty `tier` and marks it as used
+        in the bank, or None if there isn't one ready yet"""
+        index = self._find_banked(tier, self._backlog_scanned, self._session_start)
+        if index is not None:
+            puzzle = self.bank[index]
+        else:
+            index, puzzle = self._take_new(tier)
+
+            # new boards are being used up faster than they're made
+            if (
+                self.on_low is not None
+                and tier not in self._low_tiers
+                and queue_level(self.board_queues[tier]) <= self.low_watermark
+            ):
+                self._low_tiers.add(tier)
+                self.on_low()
+
+        if index is not None:
+            self.bank.mark_used(index)
+        if puzzle is not None:
+            self._low_tiers.discard(tier)
+
+        return puzzle
+
+    def get_played(self, rng=random, tier=None):
+        """Returns a random puzzle that has already been banked, played or not, or None
+        if the bank is empty. For when the player would otherwise have to wait. The
+        puzzle is of difficulty `tier` if one turns up in a few tries"""
+        if len(self.bank) == 0:
+            return None
+
+        for _ in range(PLAYED_TIER_TRIES):
+            index = rng.randrange(len(self.bank))
+            if tier is None or self.bank.get_tier(index) == tier:
+                break
+
+        return self.bank[index]
@@ -50,14 +50,18 @@ class Tile:
     @state.setter
     def state(self, value):
         if value == TileState.QUEEN and self._state != TileState.QUEEN:
-            self.board.color_queen_count[self.color.value - 1] += 1
-            self.board.row_queen_count[self.x] += 1
+            self._state = value
+            self.board._update_queen_counts(self, 1)
         elif value != TileState.QUEEN and self._state == TileState.QUEEN:
-            self.board.color_queen_count[self.color.value - 1] -= 1
-            self.board.row_queen_count[self.x] -= 1
+            self._state = value
+            self.board._update_queen_counts(self, -1)
 
         self._state = value
 
+        # the hints read the board's queen counts, so they go after them
+        if self.board.hints is not None:
+            self.board.hints.set_state(self, value)
+
     def __repr__(self):
         return f"Tile({self.x}, {self.y}, {self.color}, {self.is_queen}, {self._state})"
 
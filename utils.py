@@ -1,13 +1,13 @@
 from constants import *
 
 
-def grid_to_screen(grid_posn):
+def grid_to_screen(grid_posn, grid_size=GRID_SIZE):
     """Take a grid position and returns the screen coordinate of
     the center of the grid position"""
     x, y = grid_posn
 
-    tile_screen_width = GRID_PIXEL_WIDTH // GRID_SIZE
-    tile_screen_height = GRID_PIXEL_HEIGHT // GRID_SIZE
+    tile_screen_width = GRID_PIXEL_WIDTH // grid_size
+    tile_screen_height = GRID_PIXEL_HEIGHT // grid_size
 
     return (
         x * tile_screen_width + (tile_screen_width // 2),
@@ -15,11 +15,16 @@ def grid_to_screen(grid_posn):
     )
 
 
-def screen_to_grid(screen_posn):
+def screen_to_grid(screen_posn, grid_size=GRID_SIZE):
     """Take a screen position and returns the grid coordinate"""
     x, y = screen_posn
 
-    tile_screen_width = GRID_PIXEL_WIDTH // GRID_SIZE
-    tile_screen_height = GRID_PIXEL_HEIGHT // GRID_SIZE
+    tile_screen_width = GRID_PIXEL_WIDTH // grid_size
+    tile_screen_height = GRID_PIXEL_HEIGHT // grid_size
 
-    return x // (tile_screen_width), y // tile_screen_height
+    # the grid doesn't always divide evenly into pixels, so the last row and column
+    # get the leftover pixels
+    return (
+        min(x // tile_screen_width, grid_size - 1),
+        min(y // tile_screen_height, grid_size - 1),
+    )